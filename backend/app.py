@@ -6,17 +6,21 @@ load_dotenv()
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
-import cv2
-import numpy as np
-import base64
+import time
 from datetime import datetime, timedelta
-from utils.vision_processor import VisionProcessor
-from utils.report_generator import ReportGenerator
+from utils.inference_pool import InferencePool
+from utils.frame_pipeline import FrameMailbox, frame_payload_bytes
+from utils.emotion_batcher import EmotionBatcher
+from utils.report_stats import REPORT_TEMPLATE_VERSION, summarize_buckets
+from utils.session_store import get_session_store
+from utils.session_journal import SessionJournal, SharedSessionJournal, LocalSessions, SharedSessions
+from utils.state_backend import get_state_backend
+from utils.detection_log import session_view, build_timeline
+from utils.focus_tracker import FocusTracker
+from utils.report_cache import ReportCache
+from utils.report_jobs import ReportJobManager
 import json
-import glob
 from routes.quiz_generator import generate_quiz, save_quiz_result, get_user_quizzes
-import PyPDF2
-import docx
 from routes.ai_assistant import (
     get_or_create_chat,
     send_message,
@@ -37,14 +41,20 @@ from utils.friends_manager import (
 import secrets
 import re
 
-active_rooms = {}
-
-friend_requests = load_all_friend_requests()
-friendships = load_all_friendships()
+# Runtime state is set up by init_runtime() at the end of this module, except
+# in the spawned inference and report workers (see there).
+# Shared between workers when STATE_BACKEND=sql (see utils/state_backend.py).
+# Values read from these maps must be assigned back after changing them.
+state_backend = None
+active_rooms = None
+friend_requests = None
+friendships = None
 
 questionnaire_data = {}
 
-report_generator = ReportGenerator()
+report_generator = None
+report_cache = ReportCache()
+session_store = None
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 # Match localhost dev + any vercel.app subdomain (handles Vercel preview URLs).
@@ -65,21 +75,32 @@ def _socketio_cors_allowed(origin):
         return True
     return bool(VERCEL_ORIGIN_REGEX.match(origin or ""))
 
-socketio = SocketIO(
-    app,
-    cors_allowed_origins=_socketio_cors_allowed,
-    async_mode='eventlet'
-)
+# Bound to the app in init_runtime(); handlers registered before that are kept.
+socketio = SocketIO()
+
+report_jobs = None
 
-vision_processor = None
+inference_pool = InferencePool()
+VISION_WARMUP = os.getenv('VISION_WARMUP', '1') == '1'
+frame_mailboxes = {}
+focus_trackers = {}
+# session_id -> [sid, bucket seconds] pairs of live timeline subscribers
+timeline_subscriptions = None
+emotion_batcher = None
 
-def get_vision_processor():
-    global vision_processor
-    if vision_processor is None:
-        vision_processor = VisionProcessor()
-    return vision_processor
+session_journal = None
+active_sessions = None
+# Sessions that stop receiving updates for this long are closed out as
+# incomplete when their journal is replayed instead of being resumed.
+JOURNAL_STALE_HOURS = float(os.getenv('JOURNAL_STALE_HOURS', '12'))
 
-active_sessions = {}
+def journal(session_id, op, sync=False, **fields):
+    active_sessions.apply(session_journal.append(session_id, op, sync=sync, **fields))
+
+MAX_SESSIONS_PAGE_SIZE = 200
+# Page size when /api/sessions/all is called without `limit`; follow
+# `next_cursor` for the rest.
+DEFAULT_SESSIONS_PAGE_SIZE = 50
 
 @app.route('/', methods=['GET'])
 def welcome():
@@ -88,6 +109,7 @@ def welcome():
         'version': '1.0.0',
         'endpoints': {
             'health': '/api/health',
+            'liveness': '/api/health/live',
             'start_session': '/api/session/start',
             'end_session': '/api/session/end'
         }
@@ -95,11 +117,30 @@ def welcome():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    # 503 until the vision models are warm, so load balancers only route to
+    # ready workers. Without eager warm-up the workers load on first use and
+    # the API is reported healthy while they are still cold.
+    vision = inference_pool.readiness()
+    ready = vision['state'] == 'ready' or (vision['state'] == 'cold' and not VISION_WARMUP)
+    if ready:
+        status = 'healthy'
+    elif vision['state'] == 'failed':
+        status = 'unhealthy'
+    else:
+        status = 'starting'
     return jsonify({
-        'status': 'healthy',
+        'status': status,
         'message': 'FocusMate backend is running',
-        'vision_processor': 'active'
-    }), 200
+        'vision_processor': vision['state'],
+        'vision': vision
+    }), 200 if ready else 503
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    # Liveness only: the process is up and serving, whether or not the vision
+    # models are warm yet. Platforms that restart or fail a deploy on a bad
+    # health check (e.g. Render) should probe this, not /api/health.
+    return jsonify({'status': 'alive', 'message': 'FocusMate backend is running'}), 200
 
 
 @app.route('/api/session/start', methods=['POST'])
@@ -108,7 +149,7 @@ def start_session():
         data = request.json
         session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
-        active_sessions[session_id] = {
+        journal(session_id, 'start', sync=True, session={
             'session_id': session_id,
             'user_id': data.get('user_id'),
             'user_email': data.get('user_email'),
@@ -133,7 +174,7 @@ def start_session():
             'total_paused_time': 0,
             'focus_score': 0,
             'completed': False
-        }
+        })
 
         print(f"Session started: {session_id}")
 
@@ -154,7 +195,7 @@ def pause_session():
         data = request.json
         session_id = data.get('session_id')
         if session_id in active_sessions:
-            active_sessions[session_id]['pauses'].append({
+            journal(session_id, 'pause', entry={
                 'timestamp': datetime.now().isoformat(),
                 'action': 'paused'
             })
@@ -171,17 +212,16 @@ def resume_session():
         session_id = data.get('session_id')
         if session_id in active_sessions:
             session = active_sessions[session_id]
-            session['pauses'].append({
+            resumed = {
                 'timestamp': datetime.now().isoformat(),
                 'action': 'resumed'
-            })
-            pauses = session['pauses']
-            if len(pauses) >= 2:
-                last_pause = pauses[-2]
-                last_resume = pauses[-1]
-                pause_time = (datetime.fromisoformat(last_resume['timestamp']) -
+            }
+            pause_time = 0
+            if session['pauses']:
+                last_pause = session['pauses'][-1]
+                pause_time = (datetime.fromisoformat(resumed['timestamp']) -
                               datetime.fromisoformat(last_pause['timestamp'])).total_seconds()
-                session['total_paused_time'] += pause_time
+            journal(session_id, 'resume', entry=resumed, paused_seconds=pause_time)
             return jsonify({'success': True}), 200
         else:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
@@ -195,7 +235,7 @@ def log_break():
         session_id = data.get('session_id')
         break_type = data.get('break_type', 'manual')
         if session_id in active_sessions:
-            active_sessions[session_id]['breaks'].append({
+            journal(session_id, 'break', entry={
                 'timestamp': datetime.now().isoformat(),
                 'type': break_type,
                 'duration': data.get('duration', 0)
@@ -214,30 +254,17 @@ def end_session():
         completed = data.get('completed', False)
         if session_id in active_sessions:
             session_data = active_sessions[session_id]
-            session_data['end_time'] = datetime.now().isoformat()
-            session_data['completed'] = completed
-            start = datetime.fromisoformat(session_data['start_time'])
-            end = datetime.fromisoformat(session_data['end_time'])
-            total_time = (end - start).total_seconds() / 60
-            active_time = total_time - (session_data['total_paused_time'] / 60)
-            session_data['duration_actual'] = round(active_time, 2)
-            focus_score = 100
-            focus_score -= session_data['distraction_warnings'] * 5
-            focus_score -= session_data['posture_warnings'] * 3
-            focus_score = max(0, min(100, focus_score))
-            session_data['focus_score'] = focus_score
-            for event in session_data['events']:
-                if event.get('emotion'):
-                    emotion = event['emotion']
-                    session_data['emotions_detected'][emotion] = \
-                        session_data['emotions_detected'].get(emotion, 0) + 1
-            save_session_to_file(session_data)
-            del active_sessions[session_id]
+            finish_session(session_data, completed, datetime.now())
+            active_sessions.discard(session_id)
+            frame_mailboxes.pop(session_id, None)
+            inference_pool.release(session_id)
+            focus_trackers.pop(session_id, None)
+            timeline_subscriptions.pop(session_id, None)
             return jsonify({
                 'success': True,
                 'message': 'Session ended and data saved',
-                'focus_score': focus_score,
-                'session_data': session_data
+                'focus_score': session_data['focus_score'],
+                'session_data': session_view(session_data)
             }), 200
         else:
             return jsonify({
@@ -250,20 +277,79 @@ def end_session():
             'error': str(e)
         }), 500
 
+TIMELINE_BUCKET_RANGE = (10, 3600)
+TIMELINE_BUCKET_ERROR = 'bucket must be between %d and %d seconds' % TIMELINE_BUCKET_RANGE
+
+def timeline_bucket(value):
+    # Bucket width in seconds from a request, or None unless it is a whole
+    # number within TIMELINE_BUCKET_RANGE. Shared by the REST and socket APIs.
+    try:
+        bucket = int(value)
+    except (TypeError, ValueError):
+        return None
+    if not TIMELINE_BUCKET_RANGE[0] <= bucket <= TIMELINE_BUCKET_RANGE[1]:
+        return None
+    return bucket
+
+@app.route('/api/session/<session_id>/timeline', methods=['GET'])
+def get_session_timeline(session_id):
+    try:
+        bucket = timeline_bucket(request.args.get('bucket', 60))
+        if bucket is None:
+            return jsonify({'success': False, 'error': TIMELINE_BUCKET_ERROR}), 400
+        session = active_sessions.get(session_id)
+        if session is not None:
+            start_time, detections, samples = session['start_time'], session['detections'], session['samples']
+        else:
+            source = session_store.get_timeline_source(session_id)
+            if source is None:
+                return jsonify({'success': False, 'error': 'Session not found'}), 404
+            start_time, detections, samples = source
+        start = datetime.fromisoformat(start_time).timestamp()
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'active': session is not None,
+            'start_time': start_time,
+            'bucket_seconds': bucket,
+            'timeline': build_timeline(start, bucket, samples, detections)
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/sessions/all', methods=['GET'])
 def get_all_sessions():
     try:
-        sessions = []
-        session_files = glob.glob('data/sessions/*.json')
-        for file_path in session_files:
-            with open(file_path, 'r') as f:
-                session_data = json.load(f)
-                sessions.append(session_data)
-        sessions.sort(key=lambda x: x['start_time'], reverse=True)
+        args = request.args
+        if not valid_user_id(args.get('user_id')):
+            return jsonify({'success': False, 'error': 'Invalid user_id'}), 400
+        for key in ('start', 'end'):
+            if args.get(key):
+                try:
+                    datetime.fromisoformat(args[key])
+                except ValueError:
+                    return jsonify({'success': False, 'error': f'Invalid {key} date'}), 400
+        limit = args.get('limit', DEFAULT_SESSIONS_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, MAX_SESSIONS_PAGE_SIZE))
+        fields = [f for f in args.get('fields', '').split(',') if f]
+        exclude = [f for f in args.get('exclude', '').split(',') if f]
+        try:
+            sessions, next_cursor = session_store.page_sessions(
+                user_id=args.get('user_id'),
+                start=args.get('start') or None,
+                end=args.get('end') or None,
+                limit=limit,
+                cursor=args.get('cursor') or None,
+                fields=fields,
+                exclude=exclude
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         return jsonify({
             'success': True,
             'sessions': sessions,
-            'count': len(sessions)
+            'count': len(sessions),
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         return jsonify({
@@ -271,75 +357,222 @@ def get_all_sessions():
             'error': str(e)
         }), 500
 
+@app.route('/api/sessions/summary', methods=['GET'])
+def get_sessions_summary():
+    # Totals for a period (all, today, week, month) from the daily rollups, so
+    # the analytics page does not need every session to show its statistics.
+    try:
+        user_id = request.args.get('user_id')
+        if not valid_user_id(user_id):
+            return jsonify({'success': False, 'error': 'Invalid user_id'}), 400
+        since_day = period_start_day(request.args.get('period', 'all'))
+        if since_day is None:
+            return jsonify({'success': False, 'error': 'Invalid period'}), 400
+        summary = summarize_buckets(session_store.daily_buckets(since_day, user_id=user_id))
+        return jsonify({'success': True, 'since': since_day or None, 'summary': summary}), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/report/single/<session_id>', methods=['GET'])
 def download_single_report(session_id):
     try:
-        file_path = f'data/sessions/{session_id}.json'
-        if not os.path.exists(file_path):
+        session_data = session_store.get_session(session_id)
+        if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
-        with open(file_path, 'r') as f:
-            session_data = json.load(f)
-        pdf_path = f'data/reports/{session_id}.pdf'
-        os.makedirs('data/reports', exist_ok=True)
-        report_generator.generate_single_session_report(session_data, pdf_path)
-        from flask import send_file
-        return send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'FocusMate_Session_{session_id}.pdf'
-        )
+        return send_report('single', {'session': session_data}, f'FocusMate_Session_{session_id}.pdf')
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/report/combined/<period>', methods=['GET'])
 def download_combined_report(period):
     try:
-        sessions = []
-        session_files = glob.glob('data/sessions/*.json')
-        for file_path in session_files:
-            with open(file_path, 'r') as f:
-                session_data = json.load(f)
-                sessions.append(session_data)
-        now = datetime.now()
-        filtered_sessions = []
-        for session in sessions:
-            session_date = datetime.fromisoformat(session['start_time'])
-            if period == 'today':
-                if session_date.date() == now.date():
-                    filtered_sessions.append(session)
-            elif period == 'week':
-                week_ago = now - timedelta(days=7)
-                if session_date >= week_ago:
-                    filtered_sessions.append(session)
-            elif period == 'month':
-                month_ago = now - timedelta(days=30)
-                if session_date >= month_ago:
-                    filtered_sessions.append(session)
-        if not filtered_sessions:
+        user_id = request.args.get('user_id')
+        if not valid_user_id(user_id):
+            return jsonify({'success': False, 'error': 'Invalid user_id'}), 400
+        recent_sessions, summary = load_period_report(period, user_id)
+        if not recent_sessions:
             return jsonify({'success': False, 'error': f'No sessions found for {period}'}), 404
-        filtered_sessions.sort(key=lambda x: x['start_time'], reverse=True)
-        pdf_path = f'data/reports/{period}_report_{now.strftime("%Y%m%d")}.pdf'
-        os.makedirs('data/reports', exist_ok=True)
-        report_generator.generate_combined_report(filtered_sessions, period, pdf_path)
-        from flask import send_file
-        return send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f'FocusMate_{period}_Report.pdf'
-        )
+        return send_report('combined', {
+            'sessions': recent_sessions, 'period': period, 'summary': summary, 'user_id': user_id
+        }, f'FocusMate_{period}_Report.pdf')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def send_report(kind, payload, download_name):
+    # The direct downloads are report jobs too: doc.build() runs in the report
+    # process pool while this request waits cooperatively for the PDF.
+    cache_key = report_cache_key(kind, payload)
+    if request.if_none_match.contains(cache_key):
+        return '', 304, {'ETag': f'"{cache_key}"'}
+    job = report_jobs.submit(kind, payload, cache_key, download_name)
+    while job['status'] in ('queued', 'running'):
+        socketio.sleep(0.05)
+    pdf_path = report_jobs.path(job)
+    if not pdf_path:
+        return jsonify({'success': False, 'error': job['error'] or f"Report is {job['status']}"}), 500
+    from flask import send_file
+    # send_file resolves relative paths against the app root, not the cwd.
+    return send_file(
+        os.path.abspath(pdf_path),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=download_name,
+        etag=cache_key
+    )
+
+COMBINED_REPORT_SESSION_ROWS = 20
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+def valid_user_id(user_id):
+    # user_id is optional; when given it ends up in queries and job payloads.
+    return user_id is None or bool(USER_ID_PATTERN.match(user_id))
+
+def report_cache_key(kind, payload):
+    # Shared by the direct downloads and /api/report/jobs, so the same report
+    # is rendered and cached once whichever way it was requested.
+    return report_cache.key({'type': kind, **payload}, REPORT_TEMPLATE_VERSION)
+
+def period_start_day(period):
+    # First day (YYYY-MM-DD) of a report period; '' for all time and None for
+    # an unknown period.
+    today = datetime.now().date()
+    if period == 'all':
+        return ''
+    if period == 'today':
+        return today.isoformat()
+    if period == 'week':
+        return (today - timedelta(days=7)).isoformat()
+    if period == 'month':
+        return (today - timedelta(days=30)).isoformat()
+    return None
+
+def load_period_report(period, user_id=None):
+    # Periods are whole days so they line up with the daily rollup buckets.
+    # The summary comes from at most ~30 buckets; only the sessions listed in
+    # the report table are read. With a user_id both are limited to that user.
+    since_day = period_start_day(period)
+    if not since_day:
+        return [], None
+    summary = summarize_buckets(session_store.daily_buckets(since_day, user_id=user_id))
+    recent_sessions, _ = session_store.page_sessions(
+        user_id=user_id,
+        start=since_day,
+        limit=COMBINED_REPORT_SESSION_ROWS,
+        exclude=['events', 'pauses']
+    )
+    return recent_sessions, summary
+
+@app.route('/api/report/jobs', methods=['POST'])
+def create_report_job():
+    try:
+        data = request.json or {}
+        kind = data.get('type')
+        if kind == 'single':
+            session_id = data.get('session_id')
+            session_data = session_store.get_session(session_id)
+            if not session_data:
+                return jsonify({'success': False, 'error': 'Session not found'}), 404
+            payload = {'session': session_data}
+            download_name = f'FocusMate_Session_{session_id}.pdf'
+        elif kind == 'combined':
+            period = data.get('period')
+            user_id = data.get('user_id')
+            if not valid_user_id(user_id):
+                return jsonify({'success': False, 'error': 'Invalid user_id'}), 400
+            sessions, summary = load_period_report(period, user_id)
+            if not sessions:
+                return jsonify({'success': False, 'error': f'No sessions found for {period}'}), 404
+            payload = {'sessions': sessions, 'period': period, 'summary': summary, 'user_id': user_id}
+            download_name = f'FocusMate_{period}_Report.pdf'
+        else:
+            return jsonify({'success': False, 'error': 'type must be single or combined'}), 400
+        cache_key = report_cache_key(kind, payload)
+        socket_id = data.get('socket_id')
+        notify = None
+        if socket_id:
+            notify = lambda job: socketio.emit('report_ready', report_job_status(job), to=socket_id)
+        job = report_jobs.submit(kind, payload, cache_key, download_name, notify)
+        return jsonify({'success': True, **report_job_status(report_jobs.describe(job))}), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/report/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **report_job_status(report_jobs.describe(job))}), 200
+
+@app.route('/api/report/jobs/<job_id>/download', methods=['GET'])
+def download_report_job(job_id):
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    pdf_path = report_jobs.path(job)
+    if not pdf_path:
+        return jsonify({'success': False, 'error': f"Report is {job['status']}"}), 409
+    from flask import send_file
+    return send_file(
+        os.path.abspath(pdf_path),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=job['download_name'],
+        etag=job['cache_key']
+    )
+
+def report_job_status(job):
+    status = dict(job)
+    if job['status'] == 'done':
+        status['download_url'] = f"/api/report/jobs/{job['job_id']}/download"
+    return status
+
+def get_report_generator():
+    # ReportLab is only imported once a report is rendered in this process.
+    global report_generator
+    if report_generator is None:
+        from utils.report_generator import ReportGenerator
+        report_generator = ReportGenerator()
+    return report_generator
+
 def save_session_to_file(session_data):
-    import json
-    import os
-    data_dir = 'data/sessions'
-    os.makedirs(data_dir, exist_ok=True)
-    filename = f"{data_dir}/{session_data['session_id']}.json"
-    with open(filename, 'w') as f:
-        json.dump(session_data, f, indent=2)
+    session_store.save_session(session_data)
+
+# Warnings and emotions are counted per FocusTracker episode or emotion
+# change, not per frame as in sessions saved before it (see the README).
+def finish_session(session_data, completed, end):
+    session_data['end_time'] = end.isoformat()
+    session_data['completed'] = completed
+    start = datetime.fromisoformat(session_data['start_time'])
+    total_time = (end - start).total_seconds() / 60
+    active_time = total_time - (session_data['total_paused_time'] / 60)
+    session_data['duration_actual'] = round(active_time, 2)
+    focus_score = 100
+    focus_score -= session_data['distraction_warnings'] * 5
+    focus_score -= session_data['posture_warnings'] * 3
+    focus_score = max(0, min(100, focus_score))
+    session_data['focus_score'] = focus_score
+    for emotion, count in session_data['detections'].emotion_counts().items():
+        session_data['emotions_detected'][emotion] = \
+            session_data['emotions_detected'].get(emotion, 0) + count
+    save_session_to_file(session_data)
+    session_journal.remove(session_data['session_id'])
+
+def restore_active_sessions():
+    # Rebuilds active_sessions from the journals of sessions that were still
+    # running when the process stopped. Journals whose session already made it
+    # into the store are leftovers from a crash right after end_session.
+    cutoff = datetime.now() - timedelta(hours=JOURNAL_STALE_HOURS)
+    restored = 0
+    for session_id, (session_data, last_seen) in session_journal.replay().items():
+        if session_store.get_session(session_id):
+            session_journal.remove(session_id)
+        elif last_seen < cutoff:
+            finish_session(session_data, False, last_seen)
+        else:
+            active_sessions.restore(session_id, session_data)
+            restored += 1
+    if restored:
+        print(f"Restored {restored} active session(s) from the journal")
 
 @app.route('/api/chat/new', methods=['POST'])
 def create_new_chat():
@@ -410,7 +643,12 @@ def generate_quiz_route():
         document_text = data.get('document_text')
         if not topic and not document_text:
             return jsonify({'success': False, 'error': 'Please provide a topic or upload a document'}), 400
-        quiz_data, error = generate_quiz(user_id, topic, question_count, quiz_type, difficulty, document_text)
+        quiz_data, error = generate_quiz(
+            user_id, topic, question_count, quiz_type, difficulty,
+            time_limit=data.get('time_limit'),
+            document_text=document_text,
+            sleep=socketio.sleep
+        )
         if error:
             return jsonify({'success': False, 'error': error}), 500
         return jsonify({'success': True, 'quiz': quiz_data}), 201
@@ -478,10 +716,12 @@ def upload_document_route():
         if filename.endswith('.txt'):
             text = file.read().decode('utf-8')
         elif filename.endswith('.pdf'):
+            import PyPDF2
             pdf_reader = PyPDF2.PdfReader(file)
             for page in pdf_reader.pages:
                 text += page.extract_text()
         elif filename.endswith('.docx'):
+            import docx
             doc = docx.Document(file)
             for paragraph in doc.paragraphs:
                 text += paragraph.text + '\n'
@@ -624,6 +864,7 @@ def accept_friend_request():
         if request_id in friend_requests:
             req = friend_requests[request_id]
             req['status'] = 'accepted'
+            friend_requests[request_id] = req
             save_friend_request(req)
 
             friendship_id = f"friendship_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -699,31 +940,19 @@ def get_friends_list():
 
 def get_friend_stats(user_id):
     try:
-        import glob
+        stats = session_store.get_user_stats(user_id)
 
-        sessions = []
-        session_files = glob.glob('data/sessions/*.json')
-
-        for file_path in session_files:
-            with open(file_path, 'r') as f:
-                session_data = json.load(f)
-                if session_data.get('user_id') == user_id:
-                    sessions.append(session_data)
-
-        if not sessions:
+        if not stats:
             return {
                 'top_subject': 'N/A',
                 'total_hours': 0,
                 'avg_focus': 0
             }
 
-        total_time = sum(s.get('duration_actual', 0) for s in sessions) / 60
-        avg_focus = sum(s.get('focus_score', 0) for s in sessions) / len(sessions)
+        total_time = stats['total_minutes'] / 60
+        avg_focus = stats['focus_sum'] / stats['session_count']
 
-        subjects = {}
-        for s in sessions:
-            subject = s.get('subject', 'Unknown')
-            subjects[subject] = subjects.get(subject, 0) + 1
+        subjects = stats['subjects']
         top_subject = max(subjects, key=subjects.get) if subjects else 'N/A'
 
         return {
@@ -882,26 +1111,36 @@ def join_study_room():
         user_id = data.get('user_id', 'user123')
         user_name = data.get('user_name', 'User')
 
-        if room_id not in active_rooms:
+        room_full = False
+
+        # The room may be gone (or never existed); None leaves it absent.
+        def add_participant(room):
+            nonlocal room_full
+            if room is None:
+                return None
+            if len(room['participants']) >= room['max_participants']:
+                room_full = True
+            elif not any(p['user_id'] == user_id for p in room['participants']):
+                room['participants'].append({
+                    'user_id': user_id,
+                    'name': user_name
+                })
+            return room
+
+        room = active_rooms.update_item(room_id, add_participant)
+
+        if room is None:
             return jsonify({
                 'success': False,
                 'error': 'Room not found'
             }), 404
 
-        room = active_rooms[room_id]
-
-        if len(room['participants']) >= room['max_participants']:
+        if room_full:
             return jsonify({
                 'success': False,
                 'error': 'Room is full'
             }), 400
 
-        if not any(p['user_id'] == user_id for p in room['participants']):
-            room['participants'].append({
-                'user_id': user_id,
-                'name': user_name
-            })
-
         with open(f'data/study_rooms/{room_id}.json', 'w') as f:
             json.dump(room, f, indent=2)
 
@@ -924,19 +1163,23 @@ def leave_study_room():
         room_id = data.get('room_id')
         user_id = data.get('user_id', 'user123')
 
-        if room_id not in active_rooms:
+        def remove_participant(room):
+            if room is None:
+                return None
+            room['participants'] = [p for p in room['participants'] if p['user_id'] != user_id]
+            if len(room['participants']) == 0:
+                room['status'] = 'ended'
+                room['ended_at'] = datetime.now().isoformat()
+            return room
+
+        room = active_rooms.update_item(room_id, remove_participant)
+
+        if room is None:
             return jsonify({
                 'success': False,
                 'error': 'Room not found'
             }), 404
 
-        room = active_rooms[room_id]
-        room['participants'] = [p for p in room['participants'] if p['user_id'] != user_id]
-
-        if len(room['participants']) == 0:
-            room['status'] = 'ended'
-            room['ended_at'] = datetime.now().isoformat()
-
         with open(f'data/study_rooms/{room_id}.json', 'w') as f:
             json.dump(room, f, indent=2)
 
@@ -971,13 +1214,46 @@ def handle_room_chat(data):
     room_id = data['room_id']
     emit('new_room_chat', data, room=room_id)
 
+# Streaming variant of /api/chat/message: the reply is sent to the requesting
+# client as chat_stream_chunk events while it is generated, then
+# chat_stream_done with the full text (or chat_stream_error).
+@socketio.on('chat_stream')
+def handle_chat_stream(data):
+    chat_id = data.get('chat_id')
+    message = data.get('message')
+    if not chat_id or not message:
+        emit('chat_stream_error', {'chat_id': chat_id, 'error': 'Missing chat_id or message'})
+        return
+    socketio.start_background_task(stream_chat_reply, request.sid, chat_id, message, data.get('image'))
+
+def stream_chat_reply(sid, chat_id, message, image):
+    def on_chunk(text):
+        socketio.emit('chat_stream_chunk', {'chat_id': chat_id, 'text': text}, to=sid)
+        # Let the hub flush the chunk before the next one is generated.
+        socketio.sleep(0)
+
+    response, error = send_message(chat_id, message, image, on_chunk=on_chunk)
+    if error:
+        socketio.emit('chat_stream_error', {'chat_id': chat_id, 'error': error}, to=sid)
+        return
+    socketio.emit('chat_stream_done', {
+        'chat_id': chat_id,
+        'response': response,
+        'timestamp': datetime.now().isoformat()
+    }, to=sid)
+
 @socketio.on('connect')
 def handle_connect():
     emit('connection_response', {'status': 'connected'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    pass
+    for key in [k for k, m in frame_mailboxes.items() if m.sid == request.sid]:
+        del frame_mailboxes[key]
+        inference_pool.release(key)
+    for session_id, subscribers in list(timeline_subscriptions.items()):
+        if any(sid == request.sid for sid, _ in subscribers):
+            remove_timeline_subscriber(session_id, request.sid)
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
@@ -987,48 +1263,221 @@ def handle_video_frame(data):
         if not frame_data:
             emit('analysis_error', {'error': 'No frame data'})
             return
-        img_data = base64.b64decode(frame_data.split(',')[1])
-        np_img = np.frombuffer(img_data, dtype=np.uint8)
-        frame = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
-        if frame is None:
-            emit('analysis_error', {'error': 'Failed to decode frame'})
-            return
-        processor = get_vision_processor()
-        analysis_result = processor.analyze_frame(frame)
-        analysis_result['session_id'] = session_id
-        analysis_result['timestamp'] = data.get('timestamp')
-        if session_id in active_sessions:
-            session = active_sessions[session_id]
-            if analysis_result['suggestion']:
-                session['events'].append({
-                    'type': 'detection',
-                    'timestamp': datetime.now().isoformat(),
-                    'emotion': analysis_result['emotion'],
-                    'distraction_level': analysis_result['distraction_level'],
-                    'suggestion': analysis_result['suggestion']
-                })
-                if analysis_result['looking_away'] or analysis_result['distraction_level'] > 0.5:
-                    session['distraction_warnings'] += 1
-                if analysis_result['posture'] == 'slouching':
-                    session['posture_warnings'] += 1
-        emit('analysis_result', analysis_result)
+        img_data = frame_payload_bytes(frame_data)
+        mailbox_key = session_id or request.sid
+        mailbox = frame_mailboxes.get(mailbox_key)
+        if mailbox is None:
+            mailbox = FrameMailbox(request.sid)
+            frame_mailboxes[mailbox_key] = mailbox
+        mailbox.put(img_data, data.get('timestamp'))
+        if not mailbox.busy:
+            mailbox.busy = True
+            socketio.start_background_task(drain_mailbox, session_id, mailbox)
     except Exception as e:
         import traceback
         traceback.print_exc()
         emit('analysis_error', {'error': str(e)})
 
+def drain_mailbox(session_id, mailbox):
+    try:
+        item = mailbox.take()
+        while item is not None:
+            img_data, timestamp, received_at = item
+            started_at = time.monotonic()
+            try:
+                # A failed submit (e.g. a broken worker pool) is reported like
+                # a failed analysis instead of ending the drain loop.
+                future = inference_pool.submit(
+                    img_data, session_id or mailbox.sid, defer_emotion=emotion_batcher is not None
+                )
+                analysis_result = inference_pool.wait(future, socketio.sleep)
+                if analysis_result is not None and emotion_batcher is not None:
+                    emotion_batcher.fill(analysis_result, mailbox)
+            except Exception as e:
+                import traceback
+                traceback.print_exc()
+                socketio.emit('analysis_error', {'error': str(e)}, to=mailbox.sid)
+            else:
+                mailbox.record(received_at, started_at)
+                deliver_analysis(mailbox, session_id, timestamp, analysis_result)
+            item = mailbox.take()
+    finally:
+        mailbox.busy = False
+
+def deliver_analysis(mailbox, session_id, timestamp, analysis_result):
+    if analysis_result is None:
+        socketio.emit('analysis_error', {'error': 'Failed to decode frame'}, to=mailbox.sid)
+        return
+    analysis_result['session_id'] = session_id
+    analysis_result['timestamp'] = timestamp
+    analysis_result['pipeline'] = mailbox.stats()
+    if session_id in active_sessions:
+        # Warnings and detection events are per smoothed episode, not per frame.
+        tracker = focus_trackers.get(session_id)
+        if tracker is None:
+            tracker = focus_trackers[session_id] = FocusTracker()
+        now = time.time()
+        distraction_started, posture_started, emotion_changed = tracker.observe(analysis_result, now)
+        analysis_result['focus'] = tracker.state()
+        if distraction_started or posture_started or emotion_changed:
+            journal(session_id, 'detection',
+                    emotion=tracker.emotion,
+                    distraction_level=round(tracker.distraction, 3),
+                    suggestion=analysis_result['suggestion'],
+                    distraction_warnings=int(distraction_started),
+                    posture_warnings=int(posture_started))
+        if tracker.sample_due(now):
+            journal(session_id, 'sample', distraction=tracker.distraction, slouching=tracker.slouching)
+            push_timeline_updates(session_id)
+    socketio.emit('analysis_result', analysis_result, to=mailbox.sid)
+
+def timeline_room(session_id, bucket):
+    return f'timeline:{session_id}:{bucket}'
+
+def push_timeline_updates(session_id):
+    # Sends subscribers the bucket the newest sample fell into; clients
+    # replace their buckets from `first_bucket` onwards.
+    session = active_sessions[session_id]
+    start = datetime.fromisoformat(session['start_time']).timestamp()
+    latest = float(session['samples'].records['t'][-1])
+    for bucket in sorted({bucket for _, bucket in timeline_subscriptions.get(session_id, ())}):
+        first_bucket = int((latest - start) // bucket)
+        socketio.emit('timeline_update', {
+            'session_id': session_id,
+            'bucket_seconds': bucket,
+            'first_bucket': first_bucket,
+            'timeline': build_timeline(start, bucket, session['samples'], session['detections'], first_bucket)
+        }, to=timeline_room(session_id, bucket))
+
+# timeline_subscriptions maps a session to its [sid, bucket] subscribers, so
+# a bucket stops being built once its last subscriber leaves or disconnects.
+def remove_timeline_subscriber(session_id, sid, bucket=None):
+    def remove(subscribers):
+        left = [[s, b] for s, b in subscribers or [] if s != sid or (bucket is not None and b != bucket)]
+        return left or None
+    timeline_subscriptions.update_item(session_id, remove)
+
+@socketio.on('subscribe_timeline')
+def handle_subscribe_timeline(data):
+    session_id = data.get('session_id')
+    bucket = timeline_bucket(data.get('bucket', 60))
+    if bucket is None:
+        emit('timeline_error', {'session_id': session_id, 'error': TIMELINE_BUCKET_ERROR})
+        return
+    session = active_sessions.get(session_id)
+    if session is None:
+        emit('timeline_error', {'session_id': session_id, 'error': 'Session not active'})
+        return
+    sid = request.sid
+    join_room(timeline_room(session_id, bucket))
+    timeline_subscriptions.update_item(
+        session_id, lambda subscribers: [p for p in subscribers or [] if p != [sid, bucket]] + [[sid, bucket]]
+    )
+    start = datetime.fromisoformat(session['start_time']).timestamp()
+    emit('timeline_update', {
+        'session_id': session_id,
+        'bucket_seconds': bucket,
+        'first_bucket': 0,
+        'timeline': build_timeline(start, bucket, session['samples'], session['detections'])
+    })
+
+@socketio.on('unsubscribe_timeline')
+def handle_unsubscribe_timeline(data):
+    session_id = data.get('session_id')
+    bucket = timeline_bucket(data.get('bucket', 60))
+    if bucket is None:
+        return
+    leave_room(timeline_room(session_id, bucket))
+    remove_timeline_subscriber(session_id, request.sid, bucket)
+
 @socketio.on('request_help')
 def handle_help_request(data):
     session_id = data.get('session_id')
     if session_id in active_sessions:
-        active_sessions[session_id]['help_requests'] += 1
-        active_sessions[session_id]['events'].append({
+        journal(session_id, 'help', entry={
             'type': 'help_requested',
             'timestamp': datetime.now().isoformat()
         })
     emit('help_response', {'message': 'Redirecting to My Notes...'})
 
 
+_runtime_ready = False
+
+def check_worker_config():
+    # WEB_WORKERS is the gunicorn worker count of the Procfile, render.yaml and
+    # Dockerfile. Per-process state would silently split between workers, so
+    # refuse to start instead.
+    workers = int(os.getenv('WEB_WORKERS', '1'))
+    if workers > 1 and not (get_state_backend().shared and os.getenv('SOCKETIO_MESSAGE_QUEUE')):
+        raise RuntimeError(
+            f'WEB_WORKERS={workers} needs STATE_BACKEND=sql and SOCKETIO_MESSAGE_QUEUE, '
+            'otherwise live state is split between the workers'
+        )
+
+def init_runtime():
+    global state_backend, active_rooms, friend_requests, friendships, session_store
+    global report_jobs, timeline_subscriptions, emotion_batcher, session_journal, active_sessions
+    global _runtime_ready
+    if _runtime_ready:
+        return
+    check_worker_config()
+    _runtime_ready = True
+
+    state_backend = get_state_backend()
+    active_rooms = state_backend.map('study_rooms')
+    friend_requests = state_backend.map('friend_requests')
+    if not len(friend_requests):
+        friend_requests.update(load_all_friend_requests())
+    friendships = state_backend.map('friendships')
+    if not len(friendships):
+        friendships.update(load_all_friendships())
+
+    session_store = get_session_store()
+    if session_store.count() == 0:
+        imported = session_store.import_json_sessions()
+        if imported:
+            print(f"Imported {imported} legacy session file(s) into the session store")
+
+    # With several workers or nodes, SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0)
+    # relays emits to rooms whose members are connected to another process.
+    socketio.init_app(
+        app,
+        cors_allowed_origins=_socketio_cors_allowed,
+        async_mode='eventlet',
+        message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+    )
+
+    report_jobs = ReportJobManager(
+        report_cache, socketio.start_background_task, socketio.sleep,
+        store=state_backend.map('report_jobs')
+    )
+    if VISION_WARMUP:
+        socketio.start_background_task(inference_pool.warm_up, socketio.sleep)
+    timeline_subscriptions = state_backend.map('timeline_subscriptions')
+    if os.getenv('EMOTION_BATCHING', '1') == '1':
+        emotion_batcher = EmotionBatcher(inference_pool, socketio.start_background_task, socketio.sleep)
+
+    if state_backend.shared:
+        session_journal = SharedSessionJournal(state_backend)
+        active_sessions = SharedSessions(state_backend)
+    else:
+        session_journal = SessionJournal(socketio.start_background_task, socketio.sleep)
+        active_sessions = LocalSessions()
+    restore_active_sessions()
+
+# gunicorn entry point: `gunicorn ... 'app:create_app()'`; `app:app` works too.
+def create_app():
+    init_runtime()
+    return app
+
+
+# Under `python app.py` the spawned inference and report workers re-import this
+# module as __mp_main__; they must not open the stores, replay journals or
+# start background tasks. Every other import gets a ready app.
+if __name__ != '__mp_main__':
+    init_runtime()
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("FocusMate Backend Starting...")
@@ -0,0 +1,103 @@
+# Cold-start import profile of the API process, based on `python -X importtime`.
+# Each run imports the target module in a fresh interpreter (vision warm-up off,
+# throwaway SQLite store) and reports the median total, the direct imports of
+# the target that cost the most, and which of the heavy feature dependencies
+# were loaded at any depth (e.g. numpy via a utils module).
+#
+# Usage, from the backend directory:
+#   python benchmarks/bench_import_time.py
+#   python benchmarks/bench_import_time.py --module app --repeat 5 --top 15
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Dependencies that should only load with the feature that needs them.
+FEATURE_MODULES = (
+    'numpy', 'cv2', 'mediapipe', 'fer', 'reportlab', 'PyPDF2', 'docx', 'PIL',
+    'google.generativeai', 'sqlalchemy'
+)
+
+
+def parse_importtime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | <indent>name".
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        head, cumulative_us, name = line.split('|', 2)
+        self_us = head.split(':', 1)[1]
+        stripped = name.rstrip()
+        depth = (len(stripped) - len(stripped.lstrip())) // 2
+        entries.append((stripped.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def profile(module, database_url):
+    env = dict(os.environ)
+    env.update({
+        'VISION_WARMUP': '0',
+        'DATABASE_URL': database_url,
+        'PYTHONDONTWRITEBYTECODE': '0'
+    })
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        # The first run fills the bytecode cache and does the one-time import
+        # of legacy session files, so the measured runs are ordinary boots.
+        profile(args.module, database_url)
+        runs = [profile(args.module, database_url) for _ in range(args.repeat)]
+    totals = []
+    for entries in runs:
+        target = next(e for e in entries if e[0] == args.module)
+        totals.append(target[3] / 1000)
+    print(f"import {args.module}: median {statistics.median(totals):.0f} ms "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}, {args.repeat} runs)")
+
+    # Direct imports of the target, i.e. one level deeper and listed before it.
+    entries = runs[len(runs) // 2]
+    index = next(i for i, e in enumerate(entries) if e[0] == args.module)
+    target_depth = entries[index][1]
+    children = []
+    for name, depth, _, cumulative in reversed(entries[:index]):
+        if depth <= target_depth:
+            break
+        if depth == target_depth + 1:
+            children.append((cumulative / 1000, name))
+    print(f"Slowest direct imports of {args.module}:")
+    for cumulative_ms, name in sorted(children, reverse=True)[:args.top]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    # First (outermost) import of each feature module, wherever it happened.
+    loaded = {}
+    for name, _, _, cumulative in entries[:index]:
+        if name in FEATURE_MODULES:
+            loaded[name] = cumulative / 1000
+    print(f"Feature dependencies loaded by import {args.module}:")
+    for name in FEATURE_MODULES:
+        if name in loaded:
+            print(f"  {loaded[name]:8.1f} ms  {name}")
+    if not loaded:
+        print("  none")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# Compares the combined-report statistics as originally computed (separate
+# sum()/max() passes over the sessions in the summary block and again in the
+# insights, with an O(subjects x sessions) most-studied lookup) against the
+# single-pass SessionStats accumulator, on synthetic sessions.
+#
+# Usage, from the backend directory:
+#   python benchmarks/bench_report_stats.py
+#   python benchmarks/bench_report_stats.py --sessions 10000 --subjects 12 --repeat 20
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.report_stats import SessionStats
+
+
+def make_sessions(count, subject_count, seed=0):
+    rng = random.Random(seed)
+    subjects = [f'subject{i}' for i in range(subject_count)]
+    return [{
+        'subject': rng.choice(subjects),
+        'duration_actual': rng.uniform(5, 120),
+        'focus_score': rng.randint(20, 100),
+        'completed': rng.random() < 0.7,
+        'breaks': [{}] * rng.randint(0, 4)
+    } for _ in range(count)]
+
+
+def multi_pass(sessions):
+    # Summary block of the original generate_combined_report()
+    total_sessions = len(sessions)
+    total_time = sum(s['duration_actual'] for s in sessions)
+    avg_focus = sum(s['focus_score'] for s in sessions) / total_sessions if total_sessions > 0 else 0
+    total_breaks = sum(len(s['breaks']) for s in sessions)
+    subjects = {}
+    for s in sessions:
+        subjects[s['subject']] = subjects.get(s['subject'], 0) + 1
+    most_studied = max(subjects, key=subjects.get) if subjects else 'N/A'
+
+    # The original _generate_combined_insights()
+    total = len(sessions)
+    avg_focus = sum(s['focus_score'] for s in sessions) / total
+    completed = sum(1 for s in sessions if s['completed'])
+    completion_rate = (completed / total) * 100
+    most_common_subject = max(set(s['subject'] for s in sessions),
+                              key=lambda x: sum(1 for s in sessions if s['subject'] == x))
+    total_time = sum(s['duration_actual'] for s in sessions)
+    return total_sessions, total_time, avg_focus, total_breaks, most_studied, completion_rate, most_common_subject
+
+
+def single_pass(sessions):
+    stats = SessionStats()
+    for s in sessions:
+        stats.add_session(s)
+    return stats.summary()
+
+
+def time_it(fn, sessions, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(sessions)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--subjects', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    sessions = make_sessions(args.sessions, args.subjects)
+    old = multi_pass(sessions)
+    new = single_pass(sessions)
+    assert old[0] == new['total_sessions'] and old[3] == new['total_breaks']
+    assert abs(old[2] - new['avg_focus']) < 1e-9 and abs(old[5] - new['completion_rate']) < 1e-9
+    assert new['subjects'][old[4]] == new['subjects'][new['most_studied']]
+
+    old_timings = time_it(multi_pass, sessions, args.repeat)
+    new_timings = time_it(single_pass, sessions, args.repeat)
+    print(f"Sessions: {args.sessions}, subjects: {args.subjects}, repeats: {args.repeat}")
+    print(f"  multi-pass: median {statistics.median(old_timings):8.2f} ms")
+    print(f" single-pass: median {statistics.median(new_timings):8.2f} ms")
+    print(f"Speed-up: {statistics.median(old_timings) / statistics.median(new_timings):.2f}x")
+
+
+if __name__ == '__main__':
+    main()
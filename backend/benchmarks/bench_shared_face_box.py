@@ -0,0 +1,96 @@
+# Compares per-frame latency and emotion agreement between the MTCNN path
+# (FER runs its own face detector) and the shared-face-box path (FER
+# classifies the face FaceMesh already found).
+#
+# Usage, from the backend directory:
+#   python benchmarks/bench_shared_face_box.py --video clip.mp4
+#   python benchmarks/bench_shared_face_box.py --images path/to/frames/
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from utils.vision_processor import VisionProcessor, StageScheduler
+
+
+def load_frames(args):
+    frames = []
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        while len(frames) < args.frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        for path in sorted(glob.glob(os.path.join(args.images, '*')))[:args.frames]:
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                frames.append(frame)
+    return frames
+
+
+def run(frames, shared_face_box):
+    processor = VisionProcessor(shared_face_box=shared_face_box)
+    # Run every stage on every frame so both paths do the same work.
+    processor.context().scheduler = StageScheduler(pose_every=1, emotion_every=1)
+    processor.analyze_frame(frames[0])
+    timings = []
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        results.append(processor.analyze_frame(frame))
+        timings.append((time.perf_counter() - start) * 1000)
+    processor.cleanup()
+    return np.array(timings), results
+
+
+def summarize(name, timings):
+    print(f"{name:>16}: mean {timings.mean():7.1f} ms  "
+          f"p50 {np.percentile(timings, 50):7.1f} ms  "
+          f"p95 {np.percentile(timings, 95):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video')
+    source.add_argument('--images')
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        print("No frames loaded")
+        return
+    print(f"Frames: {len(frames)} at {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    mtcnn_timings, mtcnn_results = run(frames, shared_face_box=False)
+    shared_timings, shared_results = run(frames, shared_face_box=True)
+    summarize('mtcnn', mtcnn_timings)
+    summarize('shared face box', shared_timings)
+    print(f"Speed-up: {mtcnn_timings.mean() / shared_timings.mean():.2f}x")
+
+    both = [(a, b) for a, b in zip(mtcnn_results, shared_results) if a['emotion'] and b['emotion']]
+    only_mtcnn = sum(1 for a, b in zip(mtcnn_results, shared_results) if a['emotion'] and not b['emotion'])
+    only_shared = sum(1 for a, b in zip(mtcnn_results, shared_results) if b['emotion'] and not a['emotion'])
+    print(f"Frames with an emotion in both paths: {len(both)} "
+          f"(mtcnn only: {only_mtcnn}, shared only: {only_shared})")
+    if both:
+        agreement = sum(1 for a, b in both if a['emotion'] == b['emotion']) / len(both)
+        confidence_diff = np.mean([abs(a['emotion_confidence'] - b['emotion_confidence']) for a, b in both])
+        flags = sum(1 for a, b in both
+                    if a['needs_help'] == b['needs_help'] and a['is_tired'] == b['is_tired']) / len(both)
+        print(f"Dominant emotion agreement: {agreement * 100:.1f}%")
+        print(f"Mean confidence difference: {confidence_diff:.3f}")
+        print(f"needs_help/is_tired agreement: {flags * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
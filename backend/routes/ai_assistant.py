@@ -1,40 +1,78 @@
-import google.generativeai as genai
 import os
 from datetime import datetime
 import json
+from utils.state_backend import get_state_backend
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+_model = None
 
-model = genai.GenerativeModel('gemini-2.5-flash')
-vision_model = genai.GenerativeModel('gemini-2.5-flash')
+# Chat data (without the model session) lives in the state backend so any
+# worker can continue a chat. Model chat sessions are per process and are
+# rebuilt from the message history when another worker has moved the chat on.
+_active_chats = None
+_model_chats = {}
 
-active_chats = {}
+
+def get_active_chats():
+    global _active_chats
+    if _active_chats is None:
+        _active_chats = get_state_backend().map('chats')
+    return _active_chats
+
+
+def get_model():
+    # google.generativeai takes most of a second to import, so it is loaded
+    # and configured on the first chat rather than at server start.
+    global _model
+    if _model is None and os.getenv('AI_BACKEND', 'gemini') == 'fake':
+        from utils.fake_model import FakeModel
+        _model = FakeModel()
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        _model = genai.GenerativeModel('gemini-2.5-flash')
+    return _model
 
 
 def get_or_create_chat(user_id, chat_id=None):
+    active_chats = get_active_chats()
     if chat_id and chat_id in active_chats:
         return active_chats[chat_id]
 
     new_chat_id = f"chat_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-    active_chats[new_chat_id] = {
+    chat_data = {
         'chat_id': new_chat_id,
         'user_id': user_id,
         'created_at': datetime.now().isoformat(),
-        'messages': [],
-        'model_chat': model.start_chat(history=[])
+        'messages': []
     }
+    active_chats[new_chat_id] = chat_data
 
     save_chat_to_file(new_chat_id)
 
-    return active_chats[new_chat_id]
+    return chat_data
+
+
+def get_model_chat(chat):
+    chat_id = chat['chat_id']
+    count, model_chat = _model_chats.get(chat_id, (None, None))
+    if count != len(chat['messages']):
+        history = []
+        for msg in chat['messages']:
+            if msg['role'] == 'user':
+                history.append({'role': 'user', 'parts': [msg['content']]})
+            else:
+                history.append({'role': 'model', 'parts': [msg['content']]})
+        model_chat = get_model().start_chat(history=history)
+        _model_chats[chat_id] = (len(chat['messages']), model_chat)
+    return model_chat
 
 
 def save_chat_to_file(chat_id):
+    active_chats = get_active_chats()
     if chat_id not in active_chats:
         return
 
-    chat_data = active_chats[chat_id].copy()
-    chat_data.pop('model_chat', None)
+    chat_data = active_chats[chat_id]
 
     os.makedirs('data/chats', exist_ok=True)
     file_path = f'data/chats/{chat_id}.json'
@@ -44,6 +82,7 @@ def save_chat_to_file(chat_id):
 
 
 def load_chat_from_file(chat_id):
+    active_chats = get_active_chats()
     file_path = f'data/chats/{chat_id}.json'
 
     if not os.path.exists(file_path):
@@ -52,20 +91,25 @@ def load_chat_from_file(chat_id):
     with open(file_path, 'r') as f:
         chat_data = json.load(f)
 
-    history = []
-    for msg in chat_data['messages']:
-        if msg['role'] == 'user':
-            history.append({'role': 'user', 'parts': [msg['content']]})
-        else:
-            history.append({'role': 'model', 'parts': [msg['content']]})
-
-    chat_data['model_chat'] = model.start_chat(history=history)
     active_chats[chat_id] = chat_data
 
     return chat_data
 
 
-def send_message(chat_id, user_message, image_data=None):
+def chunk_text(chunk):
+    # Streamed chunks without parts (a safety-blocked chunk, or the last one
+    # carrying only the finish_reason) raise ValueError from `.text`, and
+    # from `.parts` too when there is no candidate at all.
+    try:
+        return chunk.text if chunk.parts else ''
+    except ValueError:
+        return ''
+
+
+def send_message(chat_id, user_message, image_data=None, on_chunk=None):
+    # With on_chunk, the response is streamed: on_chunk(text) is called for
+    # each part as it arrives. The chat is saved once, when it is complete.
+    active_chats = get_active_chats()
     if chat_id not in active_chats:
         load_chat_from_file(chat_id)
 
@@ -75,6 +119,7 @@ def send_message(chat_id, user_message, image_data=None):
     chat = active_chats[chat_id]
 
     try:
+        model_chat = get_model_chat(chat)
         chat['messages'].append({
             'role': 'user',
             'content': user_message,
@@ -90,18 +135,30 @@ def send_message(chat_id, user_message, image_data=None):
             image_bytes = base64.b64decode(image_data.split(',')[1])
             image = Image.open(io.BytesIO(image_bytes))
 
-            response = vision_model.generate_content([user_message, image])
-            ai_response = response.text
+            response = get_model().generate_content([user_message, image], stream=on_chunk is not None)
         else:
-            response = chat['model_chat'].send_message(user_message)
+            response = model_chat.send_message(user_message, stream=on_chunk is not None)
+
+        if on_chunk is None:
             ai_response = response.text
+        else:
+            parts = []
+            for chunk in response:
+                text = chunk_text(chunk)
+                if text:
+                    parts.append(text)
+                    on_chunk(text)
+            ai_response = ''.join(parts)
 
         chat['messages'].append({
             'role': 'assistant',
             'content': ai_response,
             'timestamp': datetime.now().isoformat()
         })
+        if not image_data:
+            _model_chats[chat_id] = (len(chat['messages']), model_chat)
 
+        active_chats[chat_id] = chat
         save_chat_to_file(chat_id)
 
         return ai_response, None
@@ -134,12 +191,13 @@ def get_all_chats(user_id):
 
 
 def delete_chat(chat_id):
+    active_chats = get_active_chats()
     file_path = f'data/chats/{chat_id}.json'
 
     if os.path.exists(file_path):
         os.remove(file_path)
 
-    if chat_id in active_chats:
-        del active_chats[chat_id]
+    active_chats.pop(chat_id, None)
+    _model_chats.pop(chat_id, None)
 
     return True
\ No newline at end of file
@@ -1,14 +1,38 @@
-import google.generativeai as genai
 import os
 import json
+import time
+import uuid
 from datetime import datetime
+from utils.response_cache import ResponseCache
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel('gemini-2.5-flash')
+_model = None
 
 quiz_history = {}
 
-def generate_quiz(user_id, topic, question_count, quiz_type, difficulty, time_limit, document_text=None):
+# Identical quiz requests (same normalized prompt) within the TTL reuse the
+# generated questions; each request still gets its own quiz record.
+quiz_cache = ResponseCache(
+    'data/quiz_cache',
+    max_bytes=int(float(os.getenv('QUIZ_CACHE_MAX_MB', '50')) * 1024 * 1024),
+    max_age_seconds=float(os.getenv('QUIZ_CACHE_TTL_MINUTES', '60')) * 60
+)
+
+
+def get_model():
+    # Imported and configured on first use to keep google.generativeai out of
+    # server start-up.
+    global _model
+    if _model is None and os.getenv('AI_BACKEND', 'gemini') == 'fake':
+        from utils.fake_model import FakeModel
+        _model = FakeModel()
+    if _model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        _model = genai.GenerativeModel('gemini-2.5-flash')
+    return _model
+
+def generate_quiz(user_id, topic, question_count, quiz_type, difficulty, time_limit, document_text=None,
+                  sleep=time.sleep):
     prompt = f"""Generate a {difficulty} difficulty quiz on the topic: {topic}
 
 Quiz Requirements:
@@ -63,20 +87,15 @@ Return ONLY a JSON array of questions, nothing else."""
 Return ONLY a JSON array of questions, nothing else."""
 
     try:
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-
-        questions = json.loads(response_text)
-
-        quiz_id = f"quiz_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        model = get_model()
+        questions = quiz_cache.get_or_generate(
+            quiz_cache.key(prompt, model.model_name),
+            lambda: request_questions(model, prompt),
+            sleep
+        )
+
+        # Coalesced requests finish together, so the timestamp alone is not unique.
+        quiz_id = f"quiz_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
         quiz_data = {
             'quiz_id': quiz_id,
             'user_id': user_id,
@@ -95,15 +114,33 @@ Return ONLY a JSON array of questions, nothing else."""
 
         return quiz_data, None
 
-    except json.JSONDecodeError as e:
-        print(f"JSON Parse Error: {e}")
-        print(f"Response text: {response_text}")
+    except json.JSONDecodeError:
         return None, "Failed to parse quiz format. Please try again."
     except Exception as e:
         print(f"Error generating quiz: {e}")
         return None, str(e)
 
 
+def request_questions(model, prompt):
+    response = model.generate_content(prompt)
+    response_text = response.text.strip()
+
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    response_text = response_text.strip()
+
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        print(f"JSON Parse Error: {e}")
+        print(f"Response text: {response_text}")
+        raise
+
+
 def save_quiz_to_file(quiz_data):
     os.makedirs('data/quizzes', exist_ok=True)
     file_path = f"data/quizzes/{quiz_data['quiz_id']}.json"
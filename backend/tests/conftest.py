@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The app keeps its state in module globals and reads its configuration when
+# it is first imported, so one app instance (offline model, shared SQL state)
+# serves the whole test run from a scratch working directory; the relative
+# data/ paths resolve there.
+TEST_ENV = {
+    'AI_BACKEND': 'fake',
+    'AI_FAKE_LATENCY_MS': '0',
+    'STATE_BACKEND': 'sql',
+    'STATE_REFRESH_MS': '0',
+    'VISION_WARMUP': '0',
+}
+
+
+@pytest.fixture(scope='session')
+def workdir(tmp_path_factory):
+    path = tmp_path_factory.mktemp('focusmate')
+    previous_cwd = os.getcwd()
+    previous_env = {name: os.environ.get(name) for name in TEST_ENV}
+    os.environ.update(TEST_ENV)
+    os.chdir(path)
+    yield path
+    os.chdir(previous_cwd)
+    for name, value in previous_env.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+@pytest.fixture(scope='session')
+def focusmate(workdir):
+    import app as focusmate
+    return focusmate
+
+
+@pytest.fixture
+def client(focusmate):
+    return focusmate.app.test_client()
+
+
+def make_session(session_id, user_id='user-a', start_time='2024-01-01T10:00:00', **fields):
+    # A finished session as end_session stores it.
+    session = {
+        'session_id': session_id,
+        'user_id': user_id,
+        'user_email': None,
+        'user_name': None,
+        'start_time': start_time,
+        'end_time': start_time,
+        'duration_planned': 25,
+        'duration_actual': 25,
+        'subject': 'Biology',
+        'study_mode': 'pomodoro',
+        'difficulty': 'medium',
+        'break_preference': 'short',
+        'distraction_sensitivity': 'medium',
+        'music_choice': 'none',
+        'pauses': [],
+        'breaks': [],
+        'events': [],
+        'emotions_detected': {},
+        'posture_warnings': 0,
+        'distraction_warnings': 0,
+        'help_requests': 0,
+        'total_paused_time': 0,
+        'focus_score': 80,
+        'completed': True
+    }
+    session.update(fields)
+    return session
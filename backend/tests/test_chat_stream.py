@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from routes import ai_assistant
+from utils.fake_model import EmptyChunk, FakeModel
+
+
+@pytest.fixture
+def streamed(focusmate, monkeypatch):
+    # Socket.IO events sent by the app, as (event, payload, sid).
+    events = []
+    monkeypatch.setattr(focusmate.socketio, 'emit',
+                        lambda event, payload, to=None, **kwargs: events.append((event, payload, to)))
+    monkeypatch.setattr(ai_assistant, '_model', FakeModel(latency_ms=0))
+    return events
+
+
+def stream(focusmate, socket, chat_id, message, events):
+    socket.emit('chat_stream', {'chat_id': chat_id, 'message': message})
+    # The reply is generated in a background task; yield until it finishes.
+    for _ in range(500):
+        if events and events[-1][0] in ('chat_stream_done', 'chat_stream_error'):
+            return events[-1]
+        focusmate.socketio.sleep(0.01)
+    pytest.fail('chat stream did not finish')
+
+
+def test_chat_stream_sends_chunks_then_persists_the_reply(focusmate, client, streamed):
+    chat_id = client.post('/api/chat/new', json={'user_id': 'user-a'}).get_json()['chat_id']
+    socket = focusmate.socketio.test_client(focusmate.app)
+
+    event, done, sid = stream(focusmate, socket, chat_id, 'Explain mitosis', streamed)
+
+    assert event == 'chat_stream_done'
+    expected = 'Reply 1 from the offline test model to: Explain mitosis'
+    assert done['response'] == expected
+    chunks = [payload for name, payload, _ in streamed if name == 'chat_stream_chunk']
+    assert len(chunks) > 1
+    assert ''.join(chunk['text'] for chunk in chunks) == expected
+    assert all(chunk['chat_id'] == chat_id for chunk in chunks)
+    assert [name for name, _, _ in streamed][-1] == 'chat_stream_done'
+    assert {to for _, _, to in streamed} == {sid}
+
+    with open(f'data/chats/{chat_id}.json') as f:
+        messages = json.load(f)['messages']
+    assert [(m['role'], m['content']) for m in messages] == [
+        ('user', 'Explain mitosis'), ('assistant', expected)
+    ]
+    history = client.get(f'/api/chat/history/{chat_id}').get_json()['messages']
+    assert history[-1]['content'] == expected
+
+
+def test_chat_stream_continues_the_conversation(focusmate, client, streamed):
+    chat_id = client.post('/api/chat/new', json={'user_id': 'user-a'}).get_json()['chat_id']
+    socket = focusmate.socketio.test_client(focusmate.app)
+
+    stream(focusmate, socket, chat_id, 'first', streamed)
+    streamed.clear()
+    _, done, _ = stream(focusmate, socket, chat_id, 'second', streamed)
+
+    assert done['response'] == 'Reply 2 from the offline test model to: second'
+
+
+def test_chat_stream_reports_unknown_chats(focusmate, streamed):
+    socket = focusmate.socketio.test_client(focusmate.app)
+
+    event, payload, _ = stream(focusmate, socket, 'chat_missing', 'hello', streamed)
+
+    assert event == 'chat_stream_error'
+    assert payload == {'chat_id': 'chat_missing', 'error': 'Chat not found'}
+    assert not any(name == 'chat_stream_chunk' for name, _, _ in streamed)
+
+
+class BlockedChunkModel(FakeModel):
+    # Streams a safety-blocked chunk between the regular ones.
+    def _stream(self, text):
+        chunks = list(super()._stream(text))
+        return iter(chunks[:1] + [EmptyChunk('SAFETY')] + chunks[1:])
+
+
+def test_chunks_without_parts_are_skipped(focusmate, client, streamed, monkeypatch):
+    monkeypatch.setattr(ai_assistant, '_model', BlockedChunkModel(latency_ms=0))
+    chat_id = client.post('/api/chat/new', json={'user_id': 'user-a'}).get_json()['chat_id']
+    socket = focusmate.socketio.test_client(focusmate.app)
+
+    event, done, _ = stream(focusmate, socket, chat_id, 'Explain osmosis', streamed)
+
+    expected = 'Reply 1 from the offline test model to: Explain osmosis'
+    assert event == 'chat_stream_done'
+    assert done['response'] == expected
+    chunks = [payload['text'] for name, payload, _ in streamed if name == 'chat_stream_chunk']
+    assert ''.join(chunks) == expected and all(chunks)
+    history = client.get(f'/api/chat/history/{chat_id}').get_json()['messages']
+    assert history[-1]['content'] == expected
+
+
+def test_fake_streams_end_with_a_chunk_without_parts():
+    chunks = list(FakeModel(latency_ms=0).generate_content('hello', stream=True))
+    assert chunks[-1].parts == []
+    with pytest.raises(ValueError):
+        chunks[-1].text
@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from utils.detection_log import DetectionLog, FocusSamples, build_timeline, merge_events
+
+START = datetime(2024, 1, 1, 10, 0, 0).timestamp()
+
+
+def test_detection_log_round_trips_through_bytes():
+    log = DetectionLog()
+    for i in range(100):
+        suggestion = 'Take a break' if i % 10 == 0 else None
+        log.append(START + i, ('happy', 'sad', None, 'bored')[i % 4], i / 100, suggestion)
+
+    restored = DetectionLog.from_bytes(log.to_bytes())
+
+    assert len(restored) == 100
+    assert restored.to_events() == log.to_events()
+    assert restored.emotion_counts() == {'happy': 25, 'sad': 25, 'bored': 25}
+    restored.append(START + 100, 'bored', 0.0, None)
+    assert restored.to_events()[-1]['emotion'] == 'bored'
+
+
+def test_focus_samples_round_trip_through_bytes():
+    samples = FocusSamples()
+    for i in range(70):
+        samples.append(START + i, 0.25, 1.0 if i % 2 else 0.0)
+
+    restored = FocusSamples.from_bytes(samples.to_bytes())
+
+    assert restored.records.tolist() == samples.records.tolist()
+
+
+def test_sidecars_are_not_interchangeable():
+    with pytest.raises(ValueError):
+        FocusSamples.from_bytes(DetectionLog().to_bytes())
+
+
+def test_legacy_events_split_into_the_log_and_merge_back():
+    events = [
+        {'type': 'detection', 'timestamp': '2024-01-01T10:00:01', 'emotion': 'happy',
+         'distraction_level': 0.5, 'suggestion': None},
+        {'type': 'help_request', 'timestamp': '2024-01-01T10:00:02'},
+        {'type': 'detection', 'timestamp': '2024-01-01T10:00:03', 'emotion': 'sad',
+         'distraction_level': 0.25, 'suggestion': 'Sit up'},
+    ]
+
+    log, other = DetectionLog.from_events(events)
+
+    assert len(log) == 2
+    assert other == [events[1]]
+    assert merge_events(log, other) == events
+
+
+def test_timeline_buckets_samples_and_events():
+    samples = FocusSamples()
+    for t, distraction in ((0, 0.2), (5, 0.4), (25, 1.0)):
+        samples.append(START + t, distraction, 0.0)
+    detections = DetectionLog()
+    for t in (1, 2, 21):
+        detections.append(START + t, 'happy', 0.0, None)
+
+    timeline = build_timeline(START, 10, samples, detections)
+
+    assert timeline['t'] == ['2024-01-01T10:00:00', '2024-01-01T10:00:10', '2024-01-01T10:00:20']
+    assert timeline['samples'] == [2, 0, 1]
+    assert timeline['distraction'] == [0.3, None, 1.0]
+    assert timeline['focus'] == [70.0, None, 0.0]
+    assert timeline['events'] == [2, 0, 1]
+
+
+def test_timeline_tail_starts_at_first_bucket():
+    samples = FocusSamples()
+    for t in range(0, 40, 5):
+        samples.append(START + t, 0.0, 0.5)
+
+    tail = build_timeline(START, 10, samples, first_bucket=2)
+
+    assert tail['t'] == ['2024-01-01T10:00:20', '2024-01-01T10:00:30']
+    assert tail['slouching'] == [0.5, 0.5]
+    assert tail['events'] == [0, 0]
+    assert build_timeline(START, 10)['t'] == []
@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('mediapipe')
+pytest.importorskip('fer')
+
+from utils.vision_processor import FACE_TILE_SIZE, VisionProcessor, mosaic_tile
+
+
+class FakeFER:
+    # Answers with one result per rectangle, each labelled by the index of its
+    # rectangle, after dropping and reordering them like a real run can.
+    def __init__(self, keep):
+        self.keep = keep
+
+    def detect_emotions(self, image, face_rectangles):
+        return [{'box': list(face_rectangles[i]), 'emotions': {'happy': (i + 1) / 8}}
+                for i in self.keep]
+
+
+def classify(count, keep):
+    vision = VisionProcessor.__new__(VisionProcessor)
+    vision.emotion_detector = FakeFER(keep)
+    tile = np.zeros((FACE_TILE_SIZE, FACE_TILE_SIZE, 3), dtype=np.uint8)
+    return vision.classify_faces([(tile, (20, 20, 80, 80))] * count)
+
+
+def test_results_are_matched_to_their_tiles_by_box():
+    fields = classify(5, keep=[4, 0, 2])
+
+    assert [f['emotion_confidence'] for f in fields] == [0.125, 0, 0.375, 0, 0.625]
+    assert [f['emotion'] for f in fields] == ['happy', None, 'happy', None, 'happy']
+
+
+def test_boxes_outside_every_tile_are_ignored():
+    # 3 faces lay out as 2x2; the fourth slot and the gutters hold no tile.
+    assert mosaic_tile((0, 0, 10, 10), cols=2, count=3) is None
+    assert mosaic_tile((200, 200, 120, 120), cols=2, count=3) is None
+    assert mosaic_tile((50, 50, 80, 80), cols=2, count=3) == 0
+    assert mosaic_tile((50, 210, 80, 80), cols=2, count=3) == 2
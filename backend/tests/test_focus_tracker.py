@@ -0,0 +1,69 @@
+import math
+
+from utils.focus_tracker import FocusTracker
+
+
+def frame(distraction=0.0, posture='good', emotion=None, looking_away=False):
+    return {'distraction_level': distraction, 'posture': posture,
+            'emotion': emotion, 'looking_away': looking_away}
+
+
+def after(tracker, alpha):
+    # The time of the next frame that moves the averages by `alpha`.
+    return tracker.last_time - tracker.tau * math.log(1.0 - alpha)
+
+
+def test_a_single_frame_never_opens_an_episode():
+    tracker = FocusTracker(smoothing_seconds=2, enter=0.6, exit=0.3)
+    assert tracker.observe(frame(1.0, 'slouching', looking_away=True), 0.0) == (False, False, False)
+    assert tracker.state()['distraction'] == 0.0
+
+
+def test_distraction_episodes_use_hysteresis():
+    # A near-zero time constant makes the average follow each frame.
+    tracker = FocusTracker(smoothing_seconds=0, enter=0.6, exit=0.3)
+    tracker.observe(frame(0.0), 0.0)
+
+    started = [tracker.observe(frame(level), t)[0]
+               for t, level in enumerate([0.5, 0.6, 0.4, 0.65, 0.31, 0.9, 0.2, 0.7], start=1)]
+
+    assert started == [False, True, False, False, False, False, False, True]
+
+
+def test_posture_episodes_start_once_per_slouch():
+    tracker = FocusTracker(smoothing_seconds=1, enter=0.6, exit=0.3)
+    tracker.observe(frame(), 0.0)
+
+    starts = [tracker.observe(frame(posture='slouching'), t)[1] for t in range(1, 6)]
+    assert starts.count(True) == 1 and tracker.slouched
+
+    for t in range(6, 9):
+        tracker.observe(frame(), t)
+    assert not tracker.slouched
+    assert tracker.observe(frame(posture='slouching'), 9)[1] is True
+
+
+def test_looking_away_counts_as_fully_distracted():
+    tracker = FocusTracker(smoothing_seconds=0, enter=0.6, exit=0.3)
+    tracker.observe(frame(), 0.0)
+    assert tracker.observe(frame(0.1, looking_away=True), 1.0)[0] is True
+
+
+def test_emotion_changes_need_a_clear_leader():
+    tracker = FocusTracker(smoothing_seconds=1, emotion_margin=0.15)
+    tracker.observe(frame(emotion='happy'), 0.0)
+    assert tracker.observe(frame(emotion='happy'), 60.0)[2] is True
+    assert tracker.emotion == 'happy'
+
+    # sad 0.55 against happy 0.45 leads, but by less than the margin.
+    assert tracker.observe(frame(emotion='sad'), after(tracker, 0.55))[2] is False
+    assert tracker.emotion == 'happy'
+
+    assert tracker.observe(frame(emotion='sad'), after(tracker, 0.5))[2] is True
+    assert tracker.emotion == 'sad'
+
+
+def test_samples_are_due_once_per_interval():
+    tracker = FocusTracker(sample_seconds=1)
+    assert [tracker.sample_due(t) for t in (0.0, 0.4, 0.99, 1.0, 1.5, 2.2)] == \
+        [True, False, False, True, False, True]
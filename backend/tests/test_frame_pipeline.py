@@ -0,0 +1,57 @@
+import pytest
+
+from utils import frame_pipeline
+from utils.frame_pipeline import FrameMailbox
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(frame_pipeline.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_newer_frames_replace_the_pending_one(clock):
+    mailbox = FrameMailbox('sid')
+    mailbox.put(b'first', 1)
+    mailbox.put(b'second', 2)
+    mailbox.put(b'third', 3)
+
+    frame_bytes, timestamp, _ = mailbox.take()
+
+    assert (frame_bytes, timestamp) == (b'third', 3)
+    assert mailbox.take() is None
+    assert mailbox.stats()['received_frames'] == 3
+    assert mailbox.stats()['dropped_frames'] == 2
+
+
+def test_a_frame_taken_in_time_is_not_dropped(clock):
+    mailbox = FrameMailbox('sid')
+    mailbox.put(b'first', 1)
+    mailbox.take()
+    mailbox.put(b'second', 2)
+
+    assert mailbox.stats()['dropped_frames'] == 0
+
+
+def test_lag_and_max_fps_follow_processed_frames(clock):
+    mailbox = FrameMailbox('sid', ema_alpha=0.5)
+    assert mailbox.stats()['max_fps'] is None
+
+    mailbox.put(b'frame', 1)
+    _, _, received_at = mailbox.take()
+    clock[0] += 0.05
+    started_at = clock[0]
+    clock[0] += 0.1
+    mailbox.record(received_at, started_at)
+
+    assert mailbox.stats() == {'received_frames': 1, 'processed_frames': 1, 'dropped_frames': 0,
+                               'lag_ms': 150.0, 'max_fps': 10.0}
+
+    started_at = clock[0]
+    clock[0] += 0.3
+    mailbox.record(started_at, started_at)
+
+    assert mailbox.stats()['max_fps'] == 5.0
+    assert mailbox.stats()['lag_ms'] == 300.0
+
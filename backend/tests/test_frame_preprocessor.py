@@ -0,0 +1,31 @@
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+np = pytest.importorskip('numpy')
+
+from utils.frame_preprocessor import jpeg_size
+
+
+def encode(width, height, *params):
+    ok, data = cv2.imencode('.jpg', np.zeros((height, width, 3), dtype=np.uint8), list(params))
+    assert ok
+    return data.tobytes()
+
+
+@pytest.mark.parametrize('params', [(), (cv2.IMWRITE_JPEG_PROGRESSIVE, 1)])
+def test_jpeg_size_reads_the_frame_header(params):
+    assert jpeg_size(encode(1280, 720, *params)) == (1280, 720)
+
+
+def test_jpeg_size_skips_fill_bytes_between_segments():
+    data = encode(64, 48)
+    # The APP0 segment ends 2 + its length bytes after SOI; pad before the next marker.
+    end = 4 + ((data[4] << 8) | data[5])
+    assert jpeg_size(data[:end] + b'\xff\xff' + data[end:]) == (64, 48)
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'\x89PNG\r\n\x1a\n' + b'\x00' * 16, b'\xff\xd8\xff', b'\xff\xd8\x00' * 8
+])
+def test_jpeg_size_gives_up_on_anything_else(data):
+    assert jpeg_size(data) is None
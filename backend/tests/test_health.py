@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def warming_up(focusmate, monkeypatch):
+    monkeypatch.setattr(focusmate, 'VISION_WARMUP', True)
+    monkeypatch.setattr(focusmate.inference_pool, 'readiness', lambda: {'state': 'warming'})
+
+
+def test_readiness_waits_for_the_vision_warm_up(client, warming_up):
+    response = client.get('/api/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'starting'
+
+
+def test_liveness_answers_during_the_warm_up(client, warming_up):
+    response = client.get('/api/health/live')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'alive'
@@ -0,0 +1,86 @@
+import os
+import time
+
+from conftest import make_session
+from utils.report_cache import ReportCache
+
+
+def cached(cache, key, size, age=0):
+    # Commits a report of `size` bytes last used `age` seconds ago.
+    tmp_path = cache.tmp_path(key)
+    with open(tmp_path, 'wb') as f:
+        f.write(b'%PDF' + b'\0' * (size - 4))
+    path = cache.commit(key, tmp_path)
+    if os.path.exists(path):
+        used = time.time() - age
+        os.utime(path, (used, used))
+    return path
+
+
+def test_key_depends_on_content_and_template_version_only():
+    cache = ReportCache('unused')
+    key = cache.key({'session_id': 's1', 'focus_score': 80}, 1)
+
+    assert cache.key({'focus_score': 80, 'session_id': 's1'}, 1) == key
+    assert cache.key({'session_id': 's1', 'focus_score': 81}, 1) != key
+    assert cache.key({'session_id': 's1', 'focus_score': 80}, 2) != key
+
+
+def test_commit_publishes_the_file_under_its_key(tmp_path):
+    cache = ReportCache(str(tmp_path), max_bytes=10 ** 6, max_age_seconds=3600)
+    assert cache.get('a') is None
+
+    path = cached(cache, 'a', 100)
+
+    assert cache.get('a') == path == cache.path('a')
+    assert os.listdir(tmp_path) == ['a.pdf']
+
+
+def test_discard_drops_an_unfinished_render(tmp_path):
+    cache = ReportCache(str(tmp_path))
+    tmp = cache.tmp_path('a')
+    open(tmp, 'wb').close()
+
+    cache.discard(tmp)
+    cache.discard(tmp)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_old_reports_are_evicted(tmp_path):
+    cache = ReportCache(str(tmp_path), max_bytes=10 ** 6, max_age_seconds=3600)
+    cached(cache, 'old', 100, age=7200)
+    cached(cache, 'new', 100)
+
+    cache.evict()
+
+    assert cache.get('old') is None
+    assert cache.get('new')
+
+
+def test_least_recently_used_reports_go_first_over_the_size_cap(tmp_path):
+    cache = ReportCache(str(tmp_path), max_bytes=2500, max_age_seconds=3600)
+    cached(cache, 'a', 1000, age=300)
+    cached(cache, 'b', 1000, age=200)
+    # Reading 'a' makes 'b' the least recently used.
+    cache.get('a')
+
+    cached(cache, 'c', 1000)
+
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+
+
+def test_report_etag_changes_with_the_session(focusmate, client):
+    focusmate.session_store.save_session(make_session('etag_session', user_id='etag-user'))
+    url = '/api/report/single/etag_session'
+    etag = client.get(url).headers['ETag']
+    assert client.get(url).headers['ETag'] == etag
+
+    focusmate.session_store.save_session(
+        make_session('etag_session', user_id='etag-user', focus_score=40)
+    )
+    changed = client.get(url, headers={'If-None-Match': etag})
+
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
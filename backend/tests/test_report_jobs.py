@@ -0,0 +1,81 @@
+from concurrent.futures import Future
+
+from utils.report_cache import ReportCache
+from utils.report_jobs import ReportJobManager
+
+
+class FailingExecutor:
+    def __init__(self, error):
+        self.error = error
+        self.submitted = 0
+
+    def submit(self, *args):
+        self.submitted += 1
+        raise self.error
+
+
+class InlineExecutor:
+    # Runs renders in the calling thread, writing a stand-in PDF.
+    def submit(self, fn, kind, payload, path):
+        with open(path, 'wb') as f:
+            f.write(b'%PDF ' + kind.encode())
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+def manager(tmp_path):
+    return ReportJobManager(
+        ReportCache(str(tmp_path / 'reports')),
+        spawn=lambda fn, *args: fn(*args),
+        sleep=lambda seconds: None
+    )
+
+
+def test_failed_submit_fails_the_job_and_frees_its_key(tmp_path):
+    jobs = manager(tmp_path)
+    jobs._executor = FailingExecutor(RuntimeError('cannot schedule new futures after shutdown'))
+    notified = []
+
+    job = jobs.submit('single', {'session': {}}, 'key', 'report.pdf', notified.append)
+
+    assert job['status'] == 'failed'
+    assert 'shutdown' in job['error']
+    assert [event['status'] for event in notified] == ['failed']
+    assert jobs._pending_by_key == {}
+
+    jobs._executor = InlineExecutor()
+    retry = jobs.submit('single', {'session': {}}, 'key', 'report.pdf')
+    assert retry['job_id'] != job['job_id']
+    assert retry['status'] == 'done'
+    assert jobs.path(retry) == jobs.cache.path('key')
+
+
+def test_identical_pending_jobs_share_one_render(tmp_path):
+    jobs = manager(tmp_path)
+    future = Future()
+    submitted = []
+    jobs._executor = type('Executor', (), {
+        'submit': lambda self, fn, kind, payload, path: submitted.append(path) or future
+    })()
+    jobs.spawn = lambda fn, *args: None
+
+    first = jobs.submit('combined', {'sessions': []}, 'key', 'report.pdf')
+    second = jobs.submit('combined', {'sessions': []}, 'key', 'report.pdf')
+
+    assert second is first
+    assert first['status'] == 'running'
+    assert len(submitted) == 1
+
+
+def test_cached_reports_finish_without_rendering(tmp_path):
+    jobs = manager(tmp_path)
+    tmp_path = jobs.cache.tmp_path('key')
+    open(tmp_path, 'wb').close()
+    jobs.cache.commit('key', tmp_path)
+    jobs._executor = FailingExecutor(AssertionError('should not render'))
+
+    job = jobs.submit('single', {'session': {}}, 'key', 'report.pdf')
+
+    assert job['status'] == 'done'
+    assert jobs._executor.submitted == 0
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import make_session
+
+
+@pytest.fixture
+def finished_session(focusmate):
+    start_time = datetime.now().replace(microsecond=0).isoformat()
+    session = make_session('report_session', user_id='report-user', start_time=start_time)
+    focusmate.session_store.save_session(session)
+    return session['session_id']
+
+
+def test_single_report_is_rendered_by_a_report_job(focusmate, client, finished_session):
+    response = client.get(f'/api/report/single/{finished_session}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert response.data.startswith(b'%PDF')
+    etag = response.headers['ETag']
+    jobs = [job for job in focusmate.report_jobs.jobs.values() if job['kind'] == 'single']
+    assert jobs and jobs[-1]['status'] == 'done'
+
+    revalidated = client.get(f'/api/report/single/{finished_session}', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+
+
+def test_combined_report_download_and_job_share_the_cache(focusmate, client, finished_session):
+    response = client.get('/api/report/combined/week?user_id=report-user')
+    assert response.status_code == 200
+    assert response.data.startswith(b'%PDF')
+
+    job = client.post('/api/report/jobs', json={
+        'type': 'combined', 'period': 'week', 'user_id': 'report-user'
+    }).get_json()
+    assert job['status'] == 'done'
+    download = client.get(job['download_url'])
+    assert download.data == response.data
+    assert download.headers['ETag'] == response.headers['ETag']
+
+
+def test_combined_report_rejects_unsafe_user_ids(client):
+    assert client.get('/api/report/combined/week?user_id=../../etc').status_code == 400
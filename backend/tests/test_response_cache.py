@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from routes import quiz_generator
+from utils.fake_model import FakeModel
+from utils.response_cache import ResponseCache
+
+
+def age_entry(cache, key, seconds):
+    # Moves the entry's creation time back, as if it were written earlier.
+    with open(cache.path(key), 'r') as f:
+        entry = json.load(f)
+    entry['created_at'] -= seconds
+    with open(cache.path(key), 'w') as f:
+        json.dump(entry, f)
+
+
+def test_key_ignores_case_and_whitespace(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=60)
+    assert cache.key('Quiz on  Cells\n', 'fake') == cache.key('quiz on cells', 'fake')
+    assert cache.key('quiz on cells', 'fake') != cache.key('quiz on cells', 'gemini')
+
+
+def test_entries_expire_after_max_age(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=60)
+    cache.put('fresh', ['q1'])
+    cache.put('stale', ['q2'])
+    age_entry(cache, 'fresh', 30)
+    age_entry(cache, 'stale', 61)
+
+    assert cache.get('fresh') == ['q1']
+    assert cache.get('stale') is None
+    assert not os.path.exists(cache.path('stale'))
+
+
+def test_reads_do_not_extend_the_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=60)
+    cache.put('entry', ['q1'])
+    age_entry(cache, 'entry', 50)
+    assert cache.get('entry') == ['q1']
+    age_entry(cache, 'entry', 20)
+    assert cache.get('entry') is None
+
+
+def test_size_cap_evicts_least_recently_used(tmp_path):
+    value = ['x' * 100]
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=3600)
+    cache.put('a', value)
+    entry_size = os.path.getsize(cache.path('a'))
+    # Room for two entries; sizes vary by a few bytes with created_at.
+    cache.max_bytes = entry_size * 5 // 2
+    cache.put('b', value)
+    now = time.time()
+    os.utime(cache.path('a'), (now - 20, now - 20))
+    os.utime(cache.path('b'), (now - 10, now - 10))
+
+    # Reading `a` makes `b` the least recently used.
+    assert cache.get('a') == value
+    cache.put('c', value)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == value
+    assert cache.get('c') == value
+
+
+def test_failed_generation_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=60)
+
+    def fail():
+        raise ValueError('bad response')
+
+    with pytest.raises(ValueError):
+        cache.get_or_generate('key', fail)
+    assert cache.get_or_generate('key', lambda: ['q1']) == ['q1']
+
+
+def test_concurrent_identical_quizzes_call_the_model_once(workdir, tmp_path, monkeypatch):
+    model = FakeModel(latency_ms=300)
+    cache = ResponseCache(str(tmp_path), max_bytes=1024 * 1024, max_age_seconds=60)
+    monkeypatch.setattr(quiz_generator, '_model', model)
+    monkeypatch.setattr(quiz_generator, 'quiz_cache', cache)
+
+    def request_quiz(user_id):
+        return quiz_generator.generate_quiz(user_id, 'Cells', 3, 'Multiple Choice', 'Easy', 10)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(request_quiz, [f'user-{i}' for i in range(8)]))
+
+    assert model.calls == 1
+    assert cache.stats == {'hits': 0, 'misses': 1, 'coalesced': 7}
+    quizzes = [quiz for quiz, error in results]
+    assert all(error is None for _, error in results)
+    assert len({quiz['quiz_id'] for quiz in quizzes}) == 8
+    assert all(quiz['questions'] == quizzes[0]['questions'] for quiz in quizzes)
+    assert len(quizzes[0]['questions']) == 3
+
+    assert request_quiz('user-late')[0]['questions'] == quizzes[0]['questions']
+    assert model.calls == 1
+    assert cache.stats['hits'] == 1
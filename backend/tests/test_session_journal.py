@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import make_session
+from utils.session_journal import LocalSessions, SessionJournal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    # Background flushes are started but not run; tests flush explicitly.
+    spawned = []
+    journal = SessionJournal(spawned.append, lambda seconds: None,
+                             directory=str(tmp_path / 'journal'), flush_interval_ms=0)
+    journal.spawned = spawned
+    return journal
+
+
+def start_record(session_id):
+    return make_session(session_id, end_time=None, completed=False)
+
+
+def detection(journal, session_id, t, emotion, distraction_warnings=0):
+    return journal.append(session_id, 'detection', t=t, emotion=emotion, distraction_level=0.5,
+                          suggestion=None, distraction_warnings=distraction_warnings,
+                          posture_warnings=0)
+
+
+def test_replay_rebuilds_the_live_sessions(journal):
+    live = LocalSessions()
+    records = [
+        journal.append('s1', 'start', sync=True, session=start_record('s1')),
+        journal.append('s1', 'pause', entry={'action': 'paused'}),
+        journal.append('s1', 'resume', entry={'action': 'resumed'}, paused_seconds=30),
+        journal.append('s1', 'break', entry={'type': 'short'}),
+        journal.append('s1', 'help', entry={'type': 'help_request'}),
+        detection(journal, 's1', 1704103200.0, 'happy', distraction_warnings=1),
+    ]
+    for record in records:
+        live.apply(record)
+    journal.flush()
+
+    session, last_seen = journal.replay()['s1']
+
+    assert [p['action'] for p in session['pauses']] == ['paused', 'resumed']
+    assert session['total_paused_time'] == 30
+    assert session['breaks'] == [{'type': 'short'}]
+    assert session['events'] == [{'type': 'help_request'}]
+    assert session['detections'].records.tolist() == live['s1']['detections'].records.tolist()
+    assert session['distraction_warnings'] == 1
+    assert last_seen.timestamp() == pytest.approx(records[-1]['t'])
+
+
+def test_buffered_records_are_flushed_in_one_background_loop(journal):
+    journal.append('s1', 'start', sync=True, session=start_record('s1'))
+    journal.append('s1', 'pause', entry={'action': 'paused'})
+    journal.append('s1', 'break', entry={'type': 'short'})
+    assert len(journal.spawned) == 1
+
+    journal.spawned[0]()
+
+    session, _ = SessionJournal(None, None, directory=journal.directory).replay()['s1']
+    assert session['breaks'] == [{'type': 'short'}]
+    assert not journal._dirty and not journal._flushing
+
+
+def test_removed_sessions_are_not_replayed(journal):
+    journal.append('done', 'start', sync=True, session=start_record('done'))
+    journal.append('open', 'start', sync=True, session=start_record('open'))
+    journal.remove('done')
+
+    assert list(journal.replay()) == ['open']
+
+
+def test_a_torn_last_line_is_ignored(journal):
+    journal.append('s1', 'start', sync=True, session=start_record('s1'))
+    journal.append('s1', 'break', sync=True, entry={'type': 'short'})
+    with open(journal.path('s1'), 'a') as f:
+        f.write('{"op": "break", "session_')
+
+    session, _ = journal.replay()['s1']
+
+    assert session['breaks'] == [{'type': 'short'}]
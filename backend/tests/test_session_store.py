@@ -0,0 +1,127 @@
+import pytest
+
+from conftest import make_session
+from utils.session_store import SessionStore, decode_cursor
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(f"sqlite:///{tmp_path / 'sessions.db'}")
+
+
+def page_all(store, **kwargs):
+    # Every page of a listing, followed through its cursors.
+    pages, cursor = [], None
+    while True:
+        sessions, cursor = store.page_sessions(cursor=cursor, **kwargs)
+        pages.append([s['session_id'] for s in sessions])
+        if cursor is None:
+            return pages
+
+
+def test_cursor_walks_sessions_that_share_a_start_time(store):
+    # Five sessions in the same second, two earlier ones and another user's.
+    for i in range(5):
+        store.save_session(make_session(f'tie_{i}', start_time='2024-01-02T09:00:00'))
+    store.save_session(make_session('early_0', start_time='2024-01-01T09:00:00'))
+    store.save_session(make_session('early_1', start_time='2024-01-01T08:00:00'))
+    store.save_session(make_session('other', user_id='user-b', start_time='2024-01-02T09:00:00'))
+
+    pages = page_all(store, user_id='user-a', limit=2)
+
+    assert pages == [['tie_4', 'tie_3'], ['tie_2', 'tie_1'], ['tie_0', 'early_0'], ['early_1']]
+
+
+def test_a_full_last_page_has_no_cursor(store):
+    for i in range(4):
+        store.save_session(make_session(f's{i}', start_time=f'2024-01-0{i + 1}T10:00:00'))
+
+    assert page_all(store, limit=2) == [['s3', 's2'], ['s1', 's0']]
+
+
+def test_date_range_applies_to_every_page(store):
+    for day in range(1, 8):
+        store.save_session(make_session(f'day_{day}', start_time=f'2024-01-0{day}T10:00:00'))
+
+    pages = page_all(store, start='2024-01-02', end='2024-01-06', limit=3)
+
+    assert pages == [['day_5', 'day_4', 'day_3'], ['day_2']]
+
+
+def test_cursor_points_at_the_last_row_of_the_page(store):
+    store.save_session(make_session('a', start_time='2024-01-01T10:00:00'))
+    store.save_session(make_session('b', start_time='2024-01-01T10:00:00'))
+
+    _, cursor = store.page_sessions(limit=1)
+
+    assert decode_cursor(cursor) == ('2024-01-01T10:00:00', 'b')
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        store.page_sessions(cursor='not-a-cursor')
+
+
+def test_fields_and_exclude_project_the_listing(store):
+    events = [{'type': 'detection', 'timestamp': '2024-01-01T10:00:05', 'focused': True}]
+    store.save_session(make_session('p', pauses=[{'action': 'paused'}], events=events))
+
+    [summary], _ = store.page_sessions(fields=['session_id', 'focus_score'])
+    assert summary == {'session_id': 'p', 'focus_score': 80}
+
+    [without_events], _ = store.page_sessions(exclude=['events'])
+    assert 'events' not in without_events
+    assert without_events['pauses'] == [{'action': 'paused'}]
+
+    [full], _ = store.page_sessions()
+    assert full['pauses'] == [{'action': 'paused'}]
+    assert [e['timestamp'] for e in full['events']] == ['2024-01-01T10:00:05']
+
+
+def test_user_stats_move_when_a_session_is_saved_again(store):
+    store.save_session(make_session('s1', duration_actual=30, focus_score=70, subject='Math'))
+    store.save_session(make_session('s2', duration_actual=20, focus_score=90))
+
+    store.save_session(make_session('s1', duration_actual=40, focus_score=60, subject='Physics'))
+
+    stats = store.get_user_stats('user-a')
+    assert stats['session_count'] == 2
+    assert stats['total_minutes'] == 60
+    assert stats['focus_sum'] == 150
+    assert stats['subjects'] == {'Biology': 1, 'Physics': 1}
+    assert store.get_user_stats('nobody') is None
+
+
+def test_rebuilt_user_stats_match_the_incremental_ones(store):
+    store.save_session(make_session('s1', duration_actual=30, subject='Math'))
+    store.save_session(make_session('s2', user_id='user-b', focus_score=55))
+    store.save_session(make_session('s1', duration_actual=45, subject='Art'))
+    incremental = {user: store.get_user_stats(user) for user in ('user-a', 'user-b')}
+
+    assert store.rebuild_rollups() == 2
+    assert {user: store.get_user_stats(user) for user in ('user-a', 'user-b')} == incremental
+
+
+def test_daily_buckets_follow_a_session_that_moves_day(store):
+    store.save_session(make_session('s1', start_time='2024-01-01T10:00:00', breaks=[{}, {}]))
+    store.save_session(make_session('s2', start_time='2024-01-01T15:00:00', completed=False))
+    store.save_session(make_session('s3', user_id='user-b', start_time='2024-01-02T09:00:00'))
+
+    store.save_session(make_session('s1', start_time='2024-01-02T10:00:00', breaks=[{}]))
+
+    buckets = {(b['user_id'], b['day']): b for b in store.daily_buckets('2024-01-01')}
+    assert sorted(buckets) == [('user-a', '2024-01-01'), ('user-a', '2024-01-02'), ('user-b', '2024-01-02')]
+    first = buckets[('user-a', '2024-01-01')]
+    assert (first['session_count'], first['completed_count'], first['break_count']) == (1, 0, 0)
+    second = buckets[('user-a', '2024-01-02')]
+    assert (second['session_count'], second['completed_count'], second['break_count']) == (1, 1, 1)
+    assert second['subjects'] == {'Biology': 1}
+    assert [b['day'] for b in store.daily_buckets('2024-01-02', user_id='user-a')] == ['2024-01-02']
+
+
+def test_rebuilt_daily_buckets_match_the_incremental_ones(store):
+    store.save_session(make_session('s1', start_time='2024-01-01T10:00:00', breaks=[{}]))
+    store.save_session(make_session('s2', start_time='2024-01-03T10:00:00', subject='Art'))
+    store.save_session(make_session('s1', start_time='2024-01-02T10:00:00'))
+    incremental = store.daily_buckets('2024-01-01')
+
+    store.rebuild_rollups()
+
+    assert store.daily_buckets('2024-01-01') == incremental
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import make_session
+
+
+@pytest.fixture
+def api_sessions(focusmate):
+    today = datetime.now().replace(microsecond=0)
+    for i in range(60):
+        focusmate.session_store.save_session(make_session(
+            f'api_{i:02d}', user_id='api-user', start_time=today.isoformat(),
+            subject='Math' if i % 2 else 'Art', duration_actual=20
+        ))
+
+
+@pytest.mark.parametrize('path', ['/api/sessions/all', '/api/sessions/summary'])
+@pytest.mark.parametrize('user_id', ['../x', 'a b', 'x' * 129])
+def test_session_routes_reject_invalid_user_ids(client, path, user_id):
+    response = client.get(path, query_string={'user_id': user_id})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid user_id'
+
+
+def test_sessions_all_pages_by_default(client, api_sessions):
+    first = client.get('/api/sessions/all?user_id=api-user&exclude=events').get_json()
+    assert first['count'] == 50
+    rest = client.get('/api/sessions/all', query_string={
+        'user_id': 'api-user', 'exclude': 'events', 'cursor': first['next_cursor']
+    }).get_json()
+    assert rest['count'] == 10
+    assert rest['next_cursor'] is None
+    ids = [s['session_id'] for s in first['sessions'] + rest['sessions']]
+    assert sorted(ids) == [f'api_{i:02d}' for i in range(60)]
+
+
+def test_summary_totals_the_period_from_rollups(client, api_sessions):
+    summary = client.get('/api/sessions/summary?user_id=api-user&period=today').get_json()['summary']
+    assert summary['total_sessions'] == 60
+    assert summary['total_minutes'] == 1200
+    assert summary['subjects'] == {'Art': 30, 'Math': 30}
+    assert client.get('/api/sessions/summary?user_id=api-user&period=year').status_code == 400
@@ -0,0 +1,112 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+from utils.state_backend import SqlStateBackend
+from utils.session_journal import SharedSessionJournal, SharedSessions
+
+
+# Ends a session through a second app instance in its own process, as a
+# second worker would, and prints the response.
+END_SESSION_SCRIPT = """
+import json, sys
+import app
+response = app.app.test_client().post('/api/session/end', json={'session_id': sys.argv[1], 'completed': True})
+print(json.dumps({'status': response.status_code, 'body': response.get_json()}))
+"""
+
+
+def start_record(session_id):
+    return {
+        'session_id': session_id,
+        'user_id': 'user-a',
+        'start_time': '2024-01-01T10:00:00',
+        'pauses': [],
+        'breaks': [],
+        'events': [],
+        'total_paused_time': 0,
+    }
+
+
+def test_workers_see_each_others_sessions(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    first, second = SqlStateBackend(url), SqlStateBackend(url)
+    first_sessions = SharedSessions(first, refresh_interval_ms=0)
+    second_sessions = SharedSessions(second, refresh_interval_ms=0)
+
+    record = SharedSessionJournal(first).append('s1', 'start', session=start_record('s1'))
+    first_sessions.apply(record)
+    record = SharedSessionJournal(second).append('s1', 'pause', entry={'action': 'paused'})
+    second_sessions.apply(record)
+
+    assert first_sessions['s1']['pauses'] == [{'action': 'paused'}]
+    assert second_sessions['s1']['user_id'] == 'user-a'
+
+    SharedSessionJournal(second).remove('s1')
+    assert 's1' not in first_sessions
+    assert SharedSessionJournal(first).replay() == {}
+
+
+def test_replay_restores_open_sessions(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    journal = SharedSessionJournal(SqlStateBackend(url))
+    journal.append('open', 'start', session=start_record('open'))
+    journal.append('open', 'break', entry={'type': 'short'})
+    journal.append('done', 'start', session=start_record('done'))
+    journal.remove('done')
+
+    restored = SharedSessionJournal(SqlStateBackend(url)).replay()
+    assert list(restored) == ['open']
+    assert restored['open'][0]['breaks'] == [{'type': 'short'}]
+
+
+def test_maps_update_atomically_across_backends(tmp_path):
+    url = f"sqlite:///{tmp_path / 'state.db'}"
+    first = SqlStateBackend(url).map('rooms')
+    second = SqlStateBackend(url).map('rooms')
+
+    first['room'] = {'members': ['a']}
+    second.update_item('room', lambda room: {'members': room['members'] + ['b']})
+    assert first['room'] == {'members': ['a', 'b']}
+
+    second.update_item('room', lambda room: None)
+    assert 'room' not in first
+
+
+def test_session_started_by_one_app_ends_on_another(focusmate, client, workdir):
+    response = client.post('/api/session/start', json={
+        'user_id': 'user-a', 'duration': 25, 'subject': 'Math'
+    })
+    session_id = response.get_json()['session_id']
+    assert client.post('/api/session/pause', json={'session_id': session_id}).status_code == 200
+
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    result = subprocess.run(
+        [sys.executable, '-c', END_SESSION_SCRIPT, session_id],
+        cwd=workdir, env=env, capture_output=True, text=True, timeout=120, check=True
+    )
+    ended = json.loads(result.stdout.strip().splitlines()[-1])
+
+    assert ended['status'] == 200
+    assert ended['body']['session_data']['subject'] == 'Math'
+    assert [p['action'] for p in ended['body']['session_data']['pauses']] == ['paused']
+    assert session_id not in focusmate.active_sessions
+    sessions = client.get('/api/sessions/all?user_id=user-a').get_json()['sessions']
+    assert session_id in [s['session_id'] for s in sessions]
+
+
+def test_several_workers_need_shared_state_and_a_message_queue(focusmate, monkeypatch):
+    monkeypatch.delenv('SOCKETIO_MESSAGE_QUEUE', raising=False)
+    monkeypatch.setenv('WEB_WORKERS', '1')
+    focusmate.check_worker_config()
+
+    monkeypatch.setenv('WEB_WORKERS', '2')
+    with pytest.raises(RuntimeError, match='SOCKETIO_MESSAGE_QUEUE'):
+        focusmate.check_worker_config()
+
+    monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', 'redis://localhost:6379/0')
+    focusmate.check_worker_config()
@@ -0,0 +1,37 @@
+def create_room(client, max_participants=2):
+    response = client.post('/api/study-groups/create', json={
+        'user_id': 'host', 'user_name': 'Host', 'roomName': 'Revision', 'maxParticipants': max_participants
+    })
+    return response.get_json()['room']['room_id']
+
+
+def test_join_and_leave_update_the_shared_room(focusmate, client):
+    room_id = create_room(client)
+
+    joined = client.post('/api/study-groups/join', json={'room_id': room_id, 'user_id': 'guest'})
+    assert joined.status_code == 200
+    assert [p['user_id'] for p in focusmate.active_rooms[room_id]['participants']] == ['host', 'guest']
+    full = client.post('/api/study-groups/join', json={'room_id': room_id, 'user_id': 'third'})
+    assert full.status_code == 400
+
+    client.post('/api/study-groups/leave', json={'room_id': room_id, 'user_id': 'guest'})
+    client.post('/api/study-groups/leave', json={'room_id': room_id, 'user_id': 'host'})
+    assert focusmate.active_rooms[room_id]['status'] == 'ended'
+
+
+def test_rooms_deleted_before_the_update_are_not_found(focusmate, client, monkeypatch):
+    rooms = focusmate.active_rooms
+    update_item = rooms.update_item
+
+    def delete_then_update(key, fn):
+        # Another worker removes the room just before this one updates it.
+        rooms.pop(key, None)
+        return update_item(key, fn)
+
+    monkeypatch.setattr(rooms, 'update_item', delete_then_update)
+    for action in ('join', 'leave'):
+        room_id = create_room(client)
+        response = client.post(f'/api/study-groups/{action}', json={'room_id': room_id, 'user_id': 'guest'})
+        assert response.status_code == 404
+        assert response.get_json()['error'] == 'Room not found'
+        assert room_id not in rooms
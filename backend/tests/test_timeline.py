@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from conftest import make_session
+
+
+@pytest.fixture
+def active_session(focusmate, client):
+    session_id = 'timeline_session'
+    focusmate.journal(session_id, 'start', sync=True, session=make_session(
+        session_id, start_time=datetime.now().isoformat(), end_time=None, completed=False
+    ))
+    yield session_id
+    client.post('/api/session/end', json={'session_id': session_id})
+
+
+@pytest.fixture
+def emitted(focusmate, monkeypatch):
+    # Replies of socket handlers, as (event, payload).
+    events = []
+    monkeypatch.setattr(focusmate, 'emit', lambda event, payload, **kwargs: events.append((event, payload)))
+    return events
+
+
+@pytest.mark.parametrize('bucket', ['5', '3601', 'abc'])
+def test_rest_timeline_rejects_buckets_outside_the_range(client, active_session, bucket):
+    response = client.get(f'/api/session/{active_session}/timeline?bucket={bucket}')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'bucket must be between 10 and 3600 seconds'
+
+
+@pytest.mark.parametrize('bucket', [5, 3601, 'abc', None])
+def test_socket_subscribe_rejects_the_same_buckets(focusmate, active_session, emitted, bucket):
+    socket = focusmate.socketio.test_client(focusmate.app)
+    socket.emit('subscribe_timeline', {'session_id': active_session, 'bucket': bucket})
+
+    assert emitted[-1] == ('timeline_error', {
+        'session_id': active_session, 'error': 'bucket must be between 10 and 3600 seconds'
+    })
+    assert active_session not in focusmate.timeline_subscriptions
+
+
+def test_subscriptions_are_dropped_on_unsubscribe_and_disconnect(focusmate, active_session, emitted):
+    first = focusmate.socketio.test_client(focusmate.app)
+    second = focusmate.socketio.test_client(focusmate.app)
+    first.emit('subscribe_timeline', {'session_id': active_session, 'bucket': 10})
+    second.emit('subscribe_timeline', {'session_id': active_session, 'bucket': 60})
+    second.emit('subscribe_timeline', {'session_id': active_session, 'bucket': 60})
+
+    assert emitted[-1][0] == 'timeline_update'
+    assert sorted(b for _, b in focusmate.timeline_subscriptions[active_session]) == [10, 60]
+
+    first.emit('unsubscribe_timeline', {'session_id': active_session, 'bucket': 10})
+    assert [b for _, b in focusmate.timeline_subscriptions[active_session]] == [60]
+
+    second.disconnect()
+    assert active_session not in focusmate.timeline_subscriptions
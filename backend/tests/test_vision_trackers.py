@@ -0,0 +1,112 @@
+import pytest
+
+pytest.importorskip('mediapipe')
+pytest.importorskip('fer')
+
+from utils import vision_processor
+from utils.vision_processor import StageScheduler, VisionProcessor
+
+
+class FakeTracker:
+    # Stands in for TrackerContext without building MediaPipe graphs.
+    def __init__(self):
+        self.scheduler = StageScheduler(pose_every=3, emotion_every=5)
+        self.last_used = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(vision_processor, 'TrackerContext', FakeTracker)
+    monkeypatch.setattr(vision_processor.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def processor(max_trackers, idle_seconds=60):
+    # Skips __init__, which loads the FER model; only the tracker pool is used.
+    vision = VisionProcessor.__new__(VisionProcessor)
+    vision.max_trackers = max_trackers
+    vision.tracker_idle_seconds = idle_seconds
+    vision._contexts = vision_processor.OrderedDict()
+    vision._overflow = None
+    vision._overflow_key = None
+    return vision
+
+
+def test_each_session_keeps_its_tracker(clock):
+    vision = processor(max_trackers=2)
+    a, b = vision.context('a'), vision.context('b')
+    assert a is not b
+    assert vision.context('a') is a
+    assert vision.context('b') is b
+
+
+def test_cap_evicts_the_least_recently_used_stale_tracker(clock):
+    vision = processor(max_trackers=2)
+    a = vision.context('a')
+    b = vision.context('b')
+    clock[0] += 10
+    vision.context('b')
+
+    c = vision.context('c')
+
+    assert a.closed and not b.closed
+    assert list(vision._contexts) == ['b', 'c']
+    assert c is not vision._overflow
+
+
+def test_sessions_beyond_a_live_cap_share_the_overflow_tracker(clock):
+    vision = processor(max_trackers=2)
+    a, b = vision.context('a'), vision.context('b')
+
+    c = vision.context('c')
+    d = vision.context('d')
+
+    assert c is d is vision._overflow
+    assert not a.closed and not b.closed
+
+
+def test_overflow_sessions_do_not_see_each_others_cached_stages(clock):
+    vision = processor(max_trackers=1)
+    vision.context('a')
+    overflow = vision.context('b')
+    overflow.scheduler.observe(True, (0.5, 0.5))
+    overflow.scheduler.store('pose', 'slouching')
+    overflow.scheduler.store('emotion', {'emotion': 'sad'})
+
+    scheduler = vision.context('c').scheduler
+    scheduler.observe(True, (0.5, 0.5))
+
+    assert scheduler.due('pose') and scheduler.due('emotion')
+    assert scheduler.cached('pose') is None
+
+
+def test_idle_trackers_are_closed(clock):
+    vision = processor(max_trackers=4, idle_seconds=60)
+    a = vision.context('a')
+    clock[0] += 61
+    vision.context('b')
+    assert a.closed
+    assert list(vision._contexts) == ['b']
+
+
+def test_stage_scheduler_reuses_results_until_due_or_the_head_moves():
+    scheduler = StageScheduler(pose_every=3, emotion_every=5, shift_threshold=0.08)
+    scheduler.observe(True, (0.5, 0.5))
+    assert scheduler.due('pose')
+    scheduler.store('pose', 'good')
+
+    scheduler.observe(True, (0.51, 0.5))
+    assert not scheduler.due('pose')
+    scheduler.observe(True, (0.51, 0.5))
+    assert not scheduler.due('pose')
+    scheduler.observe(True, (0.51, 0.5))
+    assert scheduler.due('pose')
+    scheduler.store('pose', 'good')
+
+    scheduler.observe(True, (0.7, 0.5))
+    assert scheduler.due('pose')
@@ -0,0 +1,237 @@
+import json
+import struct
+from datetime import datetime
+
+# numpy is imported where the rows are built or read, so importing this module
+# (which the app, session store and journal all do) does not load it; the
+# dtypes are plain field lists numpy accepts as they are.
+
+# One row per detection event: epoch seconds, emotion and suggestion as codes
+# into the log's string tables (0 = None), and the distraction level.
+EVENT_DTYPE = [
+    ('t', '<f8'),
+    ('emotion', 'u1'),
+    ('distraction', '<f4'),
+    ('suggestion', 'u1')
+]
+# Smoothed focus state sampled at a fixed rate (see FocusTracker) for timelines.
+SAMPLE_DTYPE = [
+    ('t', '<f8'),
+    ('distraction', '<f4'),
+    ('slouching', '<f4')
+]
+EMOTIONS = ('angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral')
+
+# Sidecar layout: magic, format version, header length, row count, a JSON
+# header (the DetectionLog string tables), then the raw rows.
+MAGIC = b'FMEV'
+SAMPLES_MAGIC = b'FMFS'
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct('<4sBII')
+
+
+def _grow(data, size):
+    if size < len(data):
+        return data
+    import numpy as np
+    grown = np.empty(max(len(data) * 2, 64), dtype=data.dtype)
+    grown[:size] = data[:size]
+    return grown
+
+
+def _pack(magic, header, records):
+    header = json.dumps(header).encode()
+    return _PREFIX.pack(magic, FORMAT_VERSION, len(header), len(records)) + header + records.tobytes()
+
+
+def _unpack(data, magic, dtype):
+    import numpy as np
+    found, version, header_size, size = _PREFIX.unpack_from(data)
+    if found != magic or version != FORMAT_VERSION:
+        raise ValueError('Unsupported detection log format')
+    offset = _PREFIX.size
+    header = json.loads(data[offset:offset + header_size])
+    offset += header_size
+    return header, np.frombuffer(data, dtype=dtype, count=size, offset=offset).copy()
+
+
+class _Codes:
+    def __init__(self, names=()):
+        self.names = [None]
+        self.index = {None: 0}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        code = self.index.get(name)
+        if code is None:
+            code = len(self.names)
+            if code > 255:
+                raise ValueError(f'Too many distinct values to encode: {name!r}')
+            self.names.append(name)
+            self.index[name] = code
+        return code
+
+
+# Columnar, append-only store for a session's detection events. Each event
+# takes 14 bytes (EVENT_DTYPE) instead of a dict with an ISO
+# timestamp; the legacy list-of-dicts `events` view is built on demand.
+class DetectionLog:
+    def __init__(self, records=None, emotions=EMOTIONS, suggestions=()):
+        self.emotions = _Codes(emotions)
+        self.suggestions = _Codes(suggestions)
+        if records is None:
+            import numpy as np
+            self._data = np.empty(64, dtype=EVENT_DTYPE)
+            self._size = 0
+        else:
+            self._data = records
+            self._size = len(records)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def records(self):
+        return self._data[:self._size]
+
+    def append(self, timestamp, emotion, distraction_level, suggestion):
+        self._data = _grow(self._data, self._size)
+        self._data[self._size] = (
+            timestamp,
+            self.emotions.code(emotion),
+            distraction_level,
+            self.suggestions.code(suggestion)
+        )
+        self._size += 1
+
+    def emotion_counts(self):
+        import numpy as np
+        counts = np.bincount(self.records['emotion'], minlength=len(self.emotions.names))
+        return {name: int(counts[code])
+                for code, name in enumerate(self.emotions.names) if name and counts[code]}
+
+    def to_events(self):
+        emotions = self.emotions.names
+        suggestions = self.suggestions.names
+        return [{
+            'type': 'detection',
+            'timestamp': datetime.fromtimestamp(t).isoformat(),
+            'emotion': emotions[emotion],
+            'distraction_level': round(float(distraction), 4),
+            'suggestion': suggestions[suggestion]
+        } for t, emotion, distraction, suggestion in self.records.tolist()]
+
+    def to_bytes(self):
+        return _pack(MAGIC, {
+            'emotions': self.emotions.names[1:],
+            'suggestions': self.suggestions.names[1:]
+        }, self.records)
+
+    @classmethod
+    def from_bytes(cls, data):
+        header, records = _unpack(data, MAGIC, EVENT_DTYPE)
+        return cls(records, header['emotions'], header['suggestions'])
+
+    @classmethod
+    def from_events(cls, events):
+        # Splits a legacy events list into a DetectionLog and the remaining
+        # (non-detection) events.
+        log = cls()
+        other = []
+        for event in events or []:
+            if event.get('type') == 'detection':
+                log.append(
+                    datetime.fromisoformat(event['timestamp']).timestamp(),
+                    event.get('emotion'),
+                    event.get('distraction_level') or 0,
+                    event.get('suggestion')
+                )
+            else:
+                other.append(event)
+        return log, other
+
+
+# Append-only SAMPLE_DTYPE rows, stored next to the DetectionLog.
+class FocusSamples:
+    def __init__(self, records=None):
+        if records is None:
+            import numpy as np
+            self._data = np.empty(64, dtype=SAMPLE_DTYPE)
+            self._size = 0
+        else:
+            self._data = records
+            self._size = len(records)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def records(self):
+        return self._data[:self._size]
+
+    def append(self, timestamp, distraction, slouching):
+        self._data = _grow(self._data, self._size)
+        self._data[self._size] = (timestamp, distraction, slouching)
+        self._size += 1
+
+    def to_bytes(self):
+        return _pack(SAMPLES_MAGIC, {}, self.records)
+
+    @classmethod
+    def from_bytes(cls, data):
+        _, records = _unpack(data, SAMPLES_MAGIC, SAMPLE_DTYPE)
+        return cls(records)
+
+
+def build_timeline(start, bucket_seconds, samples=None, detections=None, first_bucket=0):
+    # Downsamples a session into fixed buckets from `start` (epoch seconds):
+    # mean distraction and slouching of the samples, focus as 100 minus the
+    # mean distraction in percent, and the number of detection events. Buckets
+    # without samples (e.g. while paused) have None values. Only buckets from
+    # `first_bucket` on are returned, which live updates use to send the tail.
+    import numpy as np
+    sample_rows = samples.records if samples is not None else np.empty(0, dtype=SAMPLE_DTYPE)
+    event_rows = detections.records if detections is not None else np.empty(0, dtype=EVENT_DTYPE)
+    sample_idx = ((sample_rows['t'] - start) // bucket_seconds).astype(np.int64)
+    event_idx = ((event_rows['t'] - start) // bucket_seconds).astype(np.int64)
+    sample_keep = sample_idx >= first_bucket
+    event_keep = event_idx >= first_bucket
+    sample_idx = sample_idx[sample_keep] - first_bucket
+    event_idx = event_idx[event_keep] - first_bucket
+    size = int(max(sample_idx.max(initial=-1), event_idx.max(initial=-1)) + 1)
+
+    counts = np.bincount(sample_idx, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        distraction = np.bincount(sample_idx, weights=sample_rows['distraction'][sample_keep], minlength=size) / counts
+        slouching = np.bincount(sample_idx, weights=sample_rows['slouching'][sample_keep], minlength=size) / counts
+    focus = np.clip(100.0 * (1.0 - distraction), 0.0, 100.0)
+    empty = counts == 0
+
+    def column(values, digits):
+        return [None if e else round(v, digits) for v, e in zip(values.tolist(), empty.tolist())]
+
+    bucket_starts = start + (first_bucket + np.arange(size)) * bucket_seconds
+    return {
+        't': [datetime.fromtimestamp(t).isoformat() for t in bucket_starts.tolist()],
+        'focus': column(focus, 1),
+        'distraction': column(distraction, 3),
+        'slouching': column(slouching, 3),
+        'samples': counts.tolist(),
+        'events': np.bincount(event_idx, minlength=size).tolist()
+    }
+
+
+def merge_events(detections, events):
+    # The legacy `events` list: detection events and the other session events
+    # (e.g. help requests) in timestamp order.
+    if detections is None or not len(detections):
+        return list(events)
+    return sorted(detections.to_events() + list(events), key=lambda e: e['timestamp'])
+
+
+def session_view(session_data):
+    # JSON-serialisable copy of an in-memory session with `events` expanded.
+    view = {k: v for k, v in session_data.items() if k not in ('detections', 'samples')}
+    view['events'] = merge_events(session_data.get('detections'), session_data.get('events', []))
+    return view
@@ -0,0 +1,70 @@
+import os
+import time
+from utils.vision_rules import empty_emotion_fields, generate_suggestion
+
+
+# Collects face tiles from every active session for a short window and runs
+# them through the emotion CNN as one batch on the inference pool, then hands
+# each session its own result. Runs in the web process; spawn/sleep are the
+# Socket.IO background-task helpers so waiting never blocks the hub.
+class EmotionBatcher:
+    def __init__(self, pool, spawn, sleep, window_ms=None, max_batch=None):
+        if window_ms is None:
+            window_ms = float(os.getenv('EMOTION_BATCH_WINDOW_MS', '30'))
+        if max_batch is None:
+            max_batch = int(os.getenv('EMOTION_BATCH_SIZE', '16'))
+        self.pool = pool
+        self.spawn = spawn
+        self.sleep = sleep
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = []
+        self._flushing = False
+
+    def classify(self, tile):
+        slot = {'done': False, 'fields': None, 'error': None}
+        self._pending.append((tile, slot))
+        if not self._flushing:
+            self._flushing = True
+            self.spawn(self._flush_loop)
+        while not slot['done']:
+            self.sleep(0.002)
+        if slot['error'] is not None:
+            raise slot['error']
+        return slot['fields']
+
+    def fill(self, results, mailbox):
+        # Completes a result whose emotion stage was deferred by the worker.
+        # The session's last emotion is reused on frames the scheduler skipped.
+        if not results.pop('emotion_deferred', False):
+            return results
+        tile = results.pop('face_tile', None)
+        if tile is not None:
+            mailbox.emotion = self.classify(tile)
+        elif not results['face_detected']:
+            mailbox.emotion = None
+        results.update(mailbox.emotion or empty_emotion_fields())
+        results['suggestion'] = generate_suggestion(results)
+        return results
+
+    def _flush_loop(self):
+        try:
+            while self._pending:
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch and time.monotonic() < deadline:
+                    self.sleep(0.002)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                try:
+                    future = self.pool.submit_emotion_batch([tile for tile, _ in batch])
+                    results = self.pool.wait(future, self.sleep)
+                    for (_, slot), fields in zip(batch, results):
+                        slot['fields'] = fields
+                except Exception as e:
+                    for _, slot in batch:
+                        slot['error'] = e
+                finally:
+                    for _, slot in batch:
+                        slot['done'] = True
+        finally:
+            self._flushing = False
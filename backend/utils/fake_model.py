@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import time
+from types import SimpleNamespace
+
+# Offline stand-in for the Gemini model, selected with AI_BACKEND=fake. It
+# answers quiz prompts with well-formed questions of the requested type and
+# count and chat messages with a canned reply, waiting AI_FAKE_LATENCY_MS per
+# call (or per chunk when streaming) to mimic the upstream latency. Like
+# Gemini, a stream ends with a chunk that has no parts and only a finish
+# reason. `calls` counts model calls, e.g. to check caching.
+
+
+class FakeModel:
+    model_name = 'fake'
+
+    def __init__(self, latency_ms=None):
+        if latency_ms is None:
+            latency_ms = float(os.getenv('AI_FAKE_LATENCY_MS', '0'))
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        if isinstance(prompt, str) and 'Question type:' in prompt:
+            text = json.dumps(_fake_quiz(prompt))
+        else:
+            text = 'This is a response from the offline test model.'
+        return self._respond(text, stream)
+
+    def start_chat(self, history=None):
+        return FakeChat(self, history or [])
+
+    def _respond(self, text, stream):
+        if not stream:
+            if self.latency:
+                time.sleep(self.latency)
+            return SimpleNamespace(text=text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        words = text.split(' ')
+        for i in range(0, len(words), 4):
+            if self.latency:
+                time.sleep(self.latency)
+            chunk = ' '.join(words[i:i + 4])
+            chunk = chunk if i + 4 >= len(words) else chunk + ' '
+            yield SimpleNamespace(text=chunk, parts=[SimpleNamespace(text=chunk)])
+        yield EmptyChunk('STOP')
+
+
+# A streamed chunk without parts, e.g. the final one or a safety-blocked one;
+# reading `.text` raises like it does on a Gemini response.
+class EmptyChunk:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+        self.parts = []
+
+    @property
+    def text(self):
+        raise ValueError(f'The response has no parts (finish_reason: {self.finish_reason})')
+
+
+class FakeChat:
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history)
+
+    def send_message(self, message, stream=False):
+        self.model.calls += 1
+        turn = len(self.history) // 2 + 1
+        text = f'Reply {turn} from the offline test model to: {message}'
+        self.history.append({'role': 'user', 'parts': [message]})
+        self.history.append({'role': 'model', 'parts': [text]})
+        return self.model._respond(text, stream)
+
+
+def _field(prompt, name, default):
+    match = re.search(rf'{name}:\s*(.+)', prompt)
+    return match.group(1).strip() if match else default
+
+
+def _fake_quiz(prompt):
+    topic = _field(prompt, 'on the topic', 'the topic')
+    count = int(_field(prompt, 'Number of questions', '5'))
+    quiz_type = _field(prompt, 'Question type', 'Multiple Choice')
+    questions = []
+    for i in range(1, count + 1):
+        question = {
+            'question': f'Question {i} about {topic}?',
+            'correct_answer': 'A',
+            'explanation': f'Explanation for question {i}.'
+        }
+        if quiz_type == 'Multiple Choice':
+            question['options'] = ['A) first', 'B) second', 'C) third', 'D) fourth']
+        elif quiz_type == 'True/False':
+            question['options'] = ['True', 'False']
+            question['correct_answer'] = 'True'
+        elif quiz_type == 'Fill in the Blank':
+            question['question'] = f'{topic} question {i} is _____.'
+            question['correct_answer'] = f'answer {i}'
+        else:
+            question['correct_answer'] = f'answer {i}'
+        questions.append(question)
+    return questions
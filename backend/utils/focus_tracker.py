@@ -0,0 +1,99 @@
+import os
+import math
+
+
+# Streaming per-session smoothing of the per-frame analysis. Distraction,
+# slouching and emotion are tracked as exponential moving averages with a
+# time constant (so the result does not depend on the client frame rate), and
+# distraction/posture episodes use hysteresis: an episode starts when the
+# average rises above `enter` and only ends once it falls below `exit`.
+# observe() reports episode starts, which are what the session counts as
+# warnings and logs as detection events.
+class FocusTracker:
+    def __init__(self, smoothing_seconds=None, enter=None, exit=None, emotion_margin=0.15,
+                 sample_seconds=None):
+        if smoothing_seconds is None:
+            smoothing_seconds = float(os.getenv('FOCUS_SMOOTHING_SECONDS', '2'))
+        if enter is None:
+            enter = float(os.getenv('FOCUS_EPISODE_ENTER', '0.6'))
+        if exit is None:
+            exit = float(os.getenv('FOCUS_EPISODE_EXIT', '0.3'))
+        if sample_seconds is None:
+            sample_seconds = float(os.getenv('FOCUS_SAMPLE_SECONDS', '1'))
+        self.tau = max(smoothing_seconds, 1e-3)
+        self.sample_seconds = sample_seconds
+        self.last_sample = None
+        self.enter = enter
+        self.exit = exit
+        self.emotion_margin = emotion_margin
+        self.last_time = None
+        self.distraction = 0.0
+        self.slouching = 0.0
+        self.emotions = {}
+        self.emotion = None
+        self.distracted = False
+        self.slouched = False
+
+    def _alpha(self, now):
+        if self.last_time is None:
+            # Averages start at rest; a single frame never opens an episode.
+            alpha = 0.0
+        else:
+            alpha = 1.0 - math.exp(-max(now - self.last_time, 0.0) / self.tau)
+        self.last_time = now
+        return alpha
+
+    def observe(self, results, now):
+        # Returns (distraction_started, posture_started, emotion_changed).
+        alpha = self._alpha(now)
+        distraction = results['distraction_level']
+        if results['looking_away']:
+            distraction = max(distraction, 1.0)
+        self.distraction += alpha * (distraction - self.distraction)
+        slouching = 1.0 if results['posture'] == 'slouching' else 0.0
+        self.slouching += alpha * (slouching - self.slouching)
+
+        distraction_started = self._hysteresis('distracted', self.distraction)
+        posture_started = self._hysteresis('slouched', self.slouching)
+        return distraction_started, posture_started, self._observe_emotion(results['emotion'], alpha)
+
+    def _hysteresis(self, flag, value):
+        active = getattr(self, flag)
+        if not active and value >= self.enter:
+            setattr(self, flag, True)
+            return True
+        if active and value <= self.exit:
+            setattr(self, flag, False)
+        return False
+
+    def _observe_emotion(self, emotion, alpha):
+        for name in self.emotions:
+            self.emotions[name] *= 1.0 - alpha
+        if emotion:
+            self.emotions[emotion] = self.emotions.get(emotion, 0.0) + alpha
+        if not self.emotions:
+            return False
+        leader = max(self.emotions, key=self.emotions.get)
+        current = self.emotions.get(self.emotion, 0.0) if self.emotion else 0.0
+        if leader != self.emotion and self.emotions[leader] >= 0.5 \
+                and self.emotions[leader] - current >= self.emotion_margin:
+            self.emotion = leader
+            return True
+        return False
+
+    def sample_due(self, now):
+        # True at most once per sample_seconds; the session records the
+        # smoothed state then, which is what focus timelines are built from.
+        if self.last_sample is not None and now - self.last_sample < self.sample_seconds:
+            return False
+        self.last_sample = now
+        return True
+
+    def state(self):
+        return {
+            'distraction': round(self.distraction, 3),
+            'slouching': round(self.slouching, 3),
+            'emotion': self.emotion,
+            'distracted': self.distracted,
+            'slouched': self.slouched
+        }
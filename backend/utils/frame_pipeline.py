@@ -0,0 +1,65 @@
+import time
+import base64
+
+
+# Frames arrive either as raw JPEG bytes (Socket.IO binary attachment) or, from
+# older clients, as a base64 data URL string.
+def frame_payload_bytes(frame_data):
+    if isinstance(frame_data, (bytes, bytearray)):
+        return frame_data
+    if ',' in frame_data:
+        frame_data = frame_data.split(',', 1)[1]
+    return base64.b64decode(frame_data)
+
+
+# Holds at most one pending frame per session: a newer frame replaces the
+# one still waiting, so latency stays bounded when clients outpace inference.
+class FrameMailbox:
+    def __init__(self, sid, ema_alpha=0.2):
+        self.sid = sid
+        self.ema_alpha = ema_alpha
+        self.pending = None
+        self.busy = False
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.lag_ms = 0.0
+        self.avg_service_time = None
+        self.emotion = None
+
+    def put(self, frame_bytes, timestamp):
+        self.received += 1
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = (frame_bytes, timestamp, time.monotonic())
+
+    def take(self):
+        item = self.pending
+        self.pending = None
+        return item
+
+    def record(self, received_at, started_at):
+        now = time.monotonic()
+        self.processed += 1
+        self.lag_ms = (now - received_at) * 1000
+        service_time = now - started_at
+        if self.avg_service_time is None:
+            self.avg_service_time = service_time
+        else:
+            self.avg_service_time += self.ema_alpha * (service_time - self.avg_service_time)
+
+    def max_fps(self):
+        # One frame per session is in flight at a time, so the sustainable
+        # rate is bounded by the average time a frame spends in inference.
+        if not self.avg_service_time:
+            return None
+        return round(1.0 / self.avg_service_time, 2)
+
+    def stats(self):
+        return {
+            'received_frames': self.received,
+            'processed_frames': self.processed,
+            'dropped_frames': self.dropped,
+            'lag_ms': round(self.lag_ms, 1),
+            'max_fps': self.max_fps()
+        }
@@ -0,0 +1,98 @@
+import os
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    # Reads (width, height) from the JPEG start-of-frame header without decoding.
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        length = (data[i + 2] << 8) | data[i + 3]
+        i += 2 + length
+    return None
+
+
+# Decodes frames at (or just above) the inference resolution and converts
+# them to RGB into per-session buffers that are reused across frames.
+class FramePreprocessor:
+    def __init__(self, target_width=None, reduced_decode=None, max_sessions=None):
+        if target_width is None:
+            target_width = int(os.getenv('VISION_TARGET_WIDTH', '640'))
+        if reduced_decode is None:
+            reduced_decode = os.getenv('VISION_REDUCED_DECODE', '1') == '1'
+        if max_sessions is None:
+            max_sessions = int(os.getenv('VISION_BUFFER_SESSIONS', '32'))
+        self.target_width = target_width
+        self.reduced_decode = reduced_decode
+        self.max_sessions = max(1, max_sessions)
+        self._buffers = OrderedDict()
+
+    def decode(self, frame_bytes):
+        np_img = np.frombuffer(frame_bytes, dtype=np.uint8)
+        flag = cv2.IMREAD_COLOR
+        if self.reduced_decode and self.target_width > 0:
+            size = jpeg_size(frame_bytes)
+            if size is not None:
+                for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                    if size[0] // factor >= self.target_width:
+                        flag = reduced_flag
+                        break
+        return cv2.imdecode(np_img, flag)
+
+    def prepare(self, frame_bytes, session_key=None):
+        frame = self.decode(frame_bytes)
+        if frame is None:
+            return None, None
+        buffers = self._session_buffers(session_key)
+        h, w = frame.shape[:2]
+        if self.target_width > 0 and w > self.target_width:
+            target_h = max(1, round(h * self.target_width / w))
+            resized = self._buffer(buffers, 'bgr', (target_h, self.target_width, 3))
+            cv2.resize(frame, (self.target_width, target_h), dst=resized, interpolation=cv2.INTER_AREA)
+            frame = resized
+        rgb = self._buffer(buffers, 'rgb', frame.shape)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        return frame, rgb
+
+    def _session_buffers(self, session_key):
+        buffers = self._buffers.get(session_key)
+        if buffers is None:
+            buffers = {}
+            self._buffers[session_key] = buffers
+            while len(self._buffers) > self.max_sessions:
+                self._buffers.popitem(last=False)
+        else:
+            self._buffers.move_to_end(session_key)
+        return buffers
+
+    def _buffer(self, buffers, name, shape):
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.empty(shape, dtype=np.uint8)
+            buffers[name] = buf
+        return buf
+
+    def release(self, session_key):
+        self._buffers.pop(session_key, None)
@@ -56,15 +56,6 @@ def load_all_friendships():
 
 
 def get_user_by_email(email):
-    import glob
-
-    for file_path in glob.glob('data/sessions/*.json'):
-        try:
-            with open(file_path, 'r') as f:
-                session = json.load(f)
-                if session.get('user_email') == email:
-                    return session.get('user_id')
-        except:
-            continue
+    from utils.session_store import get_session_store
 
-    return None
\ No newline at end of file
+    return get_session_store().find_user_id_by_email(email)
@@ -0,0 +1,268 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+_worker_processor = None
+_worker_preprocessor = None
+_worker_timings = {}
+
+WARMUP_SESSION_KEY = '__warmup__'
+
+
+def _init_worker():
+    global _worker_processor, _worker_preprocessor
+    started = time.perf_counter()
+    from utils.vision_processor import VisionProcessor
+    from utils.frame_preprocessor import FramePreprocessor
+    _worker_processor = VisionProcessor()
+    _worker_preprocessor = FramePreprocessor()
+    _worker_timings['load_seconds'] = round(time.perf_counter() - started, 3)
+    if os.getenv('VISION_WARMUP', '1') == '1':
+        _warm_up_worker(int(os.getenv('VISION_WARMUP_FRAMES', '3')))
+
+
+def _warm_up_worker(frames):
+    # Pushes synthetic frames through decode, FaceMesh, Pose and the emotion
+    # CNN so TensorFlow/MediaPipe graph set-up happens before the first user
+    # frame instead of during it.
+    import cv2
+    import numpy as np
+    from utils.vision_processor import StageScheduler, FACE_TILE_SIZE
+    started = time.perf_counter()
+    height, width = 480, 640
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    frame = np.dstack([np.tile(gradient, (height, 1))] * 3)
+    ok, jpeg = cv2.imencode('.jpg', frame)
+    tile = (np.full((FACE_TILE_SIZE, FACE_TILE_SIZE, 3), 128, dtype=np.uint8),
+            (0, 0, FACE_TILE_SIZE, FACE_TILE_SIZE))
+    _worker_processor.context(WARMUP_SESSION_KEY).scheduler = StageScheduler(pose_every=1, emotion_every=1)
+    try:
+        for _ in range(max(1, frames)):
+            bgr, rgb = _worker_preprocessor.prepare(jpeg.tobytes(), WARMUP_SESSION_KEY)
+            _worker_processor.analyze_frame(bgr, rgb, session_key=WARMUP_SESSION_KEY)
+            _worker_processor.classify_faces([tile])
+    finally:
+        _worker_processor.release(WARMUP_SESSION_KEY)
+        _worker_preprocessor.release(WARMUP_SESSION_KEY)
+    _worker_timings['warmup_seconds'] = round(time.perf_counter() - started, 3)
+    _worker_timings['warmup_frames'] = max(1, frames)
+
+
+def _worker_status():
+    return {'pid': os.getpid(), **_worker_timings}
+
+
+def _analyze_in_worker(frame_bytes, session_key=None, defer_emotion=False, reset=False):
+    if reset:
+        # The session was moved here from a worker that died. Its tracking
+        # state is gone with that process, so start with fresh trackers.
+        _release_in_worker(session_key)
+    frame, rgb_frame = _worker_preprocessor.prepare(frame_bytes, session_key)
+    if frame is None:
+        return None
+    return _worker_processor.analyze_frame(frame, rgb_frame, defer_emotion, session_key)
+
+
+def _release_in_worker(session_key):
+    _worker_processor.release(session_key)
+    _worker_preprocessor.release(session_key)
+
+
+def _classify_in_worker(tiles):
+    return _worker_processor.classify_faces(tiles)
+
+
+# Runs vision inference in VISION_WORKERS processes, each behind its own
+# single-process executor so that all frames of a session go to the same
+# worker: FaceMesh and Pose track landmarks from frame to frame
+# (static_image_mode=False), which only works if the worker has seen the
+# session's previous frames. Sessions are assigned to the least loaded worker
+# on their first frame and keep it until release(). A worker that dies is
+# respawned, and its sessions move to the least loaded surviving workers.
+class InferencePool:
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = int(os.getenv('VISION_WORKERS', '1'))
+        self.workers = max(0, workers)
+        self._slots = []
+        # session_key -> slot index, and the sessions each slot owns
+        self._owners = {}
+        self._slot_sessions = []
+        # Sessions whose next frame goes to a new owner after a worker died.
+        self._moved = set()
+        self._next_batch_slot = 0
+        self.restarts = 0
+        # cold -> warming -> ready (or failed); without an eager warm-up the
+        # pool becomes ready when its first frame has been analysed.
+        self.state = 'cold'
+        self.error = None
+        self.warmup_seconds = None
+        self.worker_status = []
+
+    def start(self):
+        if self._slots:
+            return
+        if self.workers == 0:
+            # Inline mode: this process acts as the only worker.
+            if _worker_processor is None:
+                _init_worker()
+            return
+        self._slots = [self._spawn() for _ in range(self.workers)]
+        self._slot_sessions = [set() for _ in range(self.workers)]
+        print(f"Inference pool started with {self.workers} worker(s)")
+
+    def _spawn(self):
+        # Never fork the eventlet hub; spawned workers import a clean interpreter.
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+
+    def warm_up(self, sleep, timeout=None):
+        # Starts every worker and waits until each has loaded (and, with
+        # VISION_WARMUP=1, warmed up) its models.
+        if timeout is None:
+            timeout = float(os.getenv('VISION_WARMUP_TIMEOUT', '300'))
+        self.state = 'warming'
+        started = time.perf_counter()
+        try:
+            self.start()
+            futures = [self._submit_retry(slot, _worker_status) for slot in range(max(1, self.workers))]
+            while not all(future.done() for future in futures):
+                if time.perf_counter() - started > timeout:
+                    ready = sum(future.done() for future in futures)
+                    raise TimeoutError(f'{ready} of {len(futures)} workers ready after {timeout}s')
+                sleep(0.2)
+            self.worker_status = [future.result() for future in futures]
+            self.state = 'ready'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            print(f"Inference pool warm-up failed: {e}")
+        self.warmup_seconds = round(time.perf_counter() - started, 3)
+        if self.state == 'ready':
+            print(f"Inference pool ready in {self.warmup_seconds}s")
+
+    def readiness(self):
+        return {
+            'state': self.state,
+            'workers': self.workers,
+            'warmup_seconds': self.warmup_seconds,
+            'worker_status': self.worker_status,
+            'sessions': [len(sessions) for sessions in self._slot_sessions],
+            'restarts': self.restarts,
+            'error': self.error
+        }
+
+    def submit(self, frame_bytes, session_key=None, defer_emotion=False):
+        self.start()
+        try:
+            future = self._submit_frame(frame_bytes, session_key, defer_emotion)
+        except BrokenProcessPool:
+            # The owner died and has been replaced; the session has a new owner.
+            future = self._submit_frame(frame_bytes, session_key, defer_emotion)
+        if self.state == 'cold':
+            future.add_done_callback(self._mark_ready)
+        return future
+
+    def _submit_frame(self, frame_bytes, session_key, defer_emotion):
+        slot = self._owner(session_key)
+        reset = session_key in self._moved
+        future = self._submit_to(slot, _analyze_in_worker, frame_bytes, session_key, defer_emotion, reset)
+        self._moved.discard(session_key)
+        return future
+
+    def _owner(self, session_key):
+        if not self._slots:
+            return 0
+        slot = self._owners.get(session_key)
+        if slot is None:
+            slot = self._least_loaded()
+            self._owners[session_key] = slot
+            self._slot_sessions[slot].add(session_key)
+        return slot
+
+    def _least_loaded(self, exclude=None):
+        candidates = [i for i in range(len(self._slots)) if i != exclude] or [exclude]
+        return min(candidates, key=lambda i: len(self._slot_sessions[i]))
+
+    def release(self, session_key):
+        # Frees the session's worker assignment (e.g. when the session ends)
+        # and its trackers and frame buffers in the worker.
+        slot = self._owners.pop(session_key, None)
+        self._moved.discard(session_key)
+        if slot is not None:
+            self._slot_sessions[slot].discard(session_key)
+            try:
+                self._slots[slot].submit(_release_in_worker, session_key)
+            except BrokenProcessPool:
+                pass
+        elif not self._slots and _worker_processor is not None:
+            _release_in_worker(session_key)
+
+    def _replace(self, slot, broken):
+        # Called when submitting to a dead worker; the in-flight frames of
+        # that worker have already failed. Respawns it and moves its sessions
+        # to the least loaded other worker, which is warm, rather than making
+        # them wait for the new process to load its models.
+        if self._slots[slot] is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._slots[slot] = self._spawn()
+        self.restarts += 1
+        moved = self._slot_sessions[slot]
+        self._slot_sessions[slot] = set()
+        for session_key in moved:
+            target = self._least_loaded(exclude=slot)
+            self._owners[session_key] = target
+            self._slot_sessions[target].add(session_key)
+            self._moved.add(session_key)
+        print(f"Inference worker {slot} died; respawned it and moved {len(moved)} session(s)")
+
+    def _mark_ready(self, future):
+        if self.state == 'cold' and future.exception() is None:
+            self.state = 'ready'
+
+    def submit_emotion_batch(self, tiles):
+        # Emotion classification keeps no per-session state; spread batches.
+        self.start()
+        slot = self._next_batch_slot
+        self._next_batch_slot = (slot + 1) % max(1, len(self._slots))
+        return self._submit_retry(slot, _classify_in_worker, tiles)
+
+    def _submit_retry(self, slot, fn, *args):
+        # For tasks that may run on any worker: retry once on the respawned one.
+        try:
+            return self._submit_to(slot, fn, *args)
+        except BrokenProcessPool:
+            return self._submit_to(slot, fn, *args)
+
+    def _submit_to(self, slot, fn, *args):
+        if self._slots:
+            executor = self._slots[slot]
+            try:
+                return executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._replace(slot, executor)
+                raise
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def wait(self, future, sleep, poll_interval=0.01):
+        # Poll cooperatively so the web worker keeps serving other clients
+        # while inference runs in another process.
+        while not future.done():
+            sleep(poll_interval)
+        return future.result()
+
+    def shutdown(self):
+        for executor in self._slots:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._slots = []
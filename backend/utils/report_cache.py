@@ -0,0 +1,78 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import uuid
+
+
+# Content-addressed PDF cache: a report is keyed by a hash of the data it was
+# rendered from plus the report template version, so an unchanged session is
+# only ever rendered once. Files are evicted by age and total size.
+class ReportCache:
+    def __init__(self, directory='data/reports', max_bytes=None, max_age_seconds=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('REPORT_CACHE_MAX_MB', '200')) * 1024 * 1024)
+        if max_age_seconds is None:
+            max_age_seconds = float(os.getenv('REPORT_CACHE_MAX_AGE_DAYS', '30')) * 86400
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+
+    def key(self, document, template_version):
+        payload = json.dumps(document, sort_keys=True, default=str)
+        digest = hashlib.sha256()
+        digest.update(str(template_version).encode())
+        digest.update(b'\0')
+        digest.update(payload.encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        # Bump mtime so size-based eviction drops the least recently used.
+        os.utime(path, None)
+        return path
+
+    def tmp_path(self, key):
+        os.makedirs(self.directory, exist_ok=True)
+        return f'{self.path(key)}.{uuid.uuid4().hex}.tmp'
+
+    def commit(self, key, tmp_path):
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def discard(self, tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pdf')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
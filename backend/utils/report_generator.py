@@ -6,6 +6,7 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
 import os
+from utils.report_stats import summarize_sessions
 
 
 class ReportGenerator:
@@ -152,7 +153,13 @@ class ReportGenerator:
         doc.build(story)
         print(f"Report generated: {filename}")
 
-    def generate_combined_report(self, sessions, period, filename):
+    def generate_combined_report(self, sessions, period, filename, summary=None):
+        # `sessions` feeds the per-session table (first 20 rows); the summary
+        # and insights come from `summary` when the caller has precomputed it,
+        # e.g. from daily buckets via summarize_buckets().
+        if summary is None:
+            summary = summarize_sessions(sessions)
+
         doc = SimpleDocTemplate(filename, pagesize=letter)
         story = []
 
@@ -162,22 +169,12 @@ class ReportGenerator:
 
         story.append(Paragraph("Summary Statistics", self.heading_style))
 
-        total_sessions = len(sessions)
-        total_time = sum(s['duration_actual'] for s in sessions)
-        avg_focus = sum(s['focus_score'] for s in sessions) / total_sessions if total_sessions > 0 else 0
-        total_breaks = sum(len(s['breaks']) for s in sessions)
-
-        subjects = {}
-        for s in sessions:
-            subjects[s['subject']] = subjects.get(s['subject'], 0) + 1
-        most_studied = max(subjects, key=subjects.get) if subjects else 'N/A'
-
         summary_data = [
-            ['Total Sessions:', str(total_sessions)],
-            ['Total Study Time:', f"{round(total_time / 60, 1)} hours"],
-            ['Average Focus Score:', f"{round(avg_focus)}%"],
-            ['Most Studied Subject:', most_studied.title()],
-            ['Total Breaks Taken:', str(total_breaks)],
+            ['Total Sessions:', str(summary['total_sessions'])],
+            ['Total Study Time:', f"{round(summary['total_minutes'] / 60, 1)} hours"],
+            ['Average Focus Score:', f"{round(summary['avg_focus'])}%"],
+            ['Most Studied Subject:', summary['most_studied'].title()],
+            ['Total Breaks Taken:', str(summary['total_breaks'])],
             ['Report Period:', period.title()]
         ]
 
@@ -228,7 +225,7 @@ class ReportGenerator:
 
         story.append(Paragraph("Insights & Recommendations", self.heading_style))
 
-        insights = self._generate_combined_insights(sessions)
+        insights = self._generate_combined_insights(summary)
         for insight in insights:
             story.append(Paragraph(f"• {insight}", self.normal_style))
             story.append(Spacer(1, 0.1 * inch))
@@ -285,25 +282,22 @@ class ReportGenerator:
 
         return recommendations
 
-    def _generate_combined_insights(self, sessions):
+    def _generate_combined_insights(self, summary):
         insights = []
 
-        total = len(sessions)
+        total = summary['total_sessions']
         if total == 0:
             return ["No sessions to analyze."]
 
-        avg_focus = sum(s['focus_score'] for s in sessions) / total
-        completed = sum(1 for s in sessions if s['completed'])
-        completion_rate = (completed / total) * 100
+        avg_focus = summary['avg_focus']
+        completion_rate = summary['completion_rate']
 
         insights.append(f"Your average focus score is {round(avg_focus)}%. {self._get_score_status(avg_focus)}!")
         insights.append(f"You completed {completion_rate:.0f}% of your planned study sessions.")
 
-        most_common_subject = max(set(s['subject'] for s in sessions),
-                                  key=lambda x: sum(1 for s in sessions if s['subject'] == x))
-        insights.append(f"You studied {most_common_subject.title()} most frequently.")
+        insights.append(f"You studied {summary['most_studied'].title()} most frequently.")
 
-        total_time = sum(s['duration_actual'] for s in sessions)
+        total_time = summary['total_minutes']
         insights.append(f"Total study time: {round(total_time / 60, 1)} hours across {total} sessions.")
 
         if avg_focus < 70:
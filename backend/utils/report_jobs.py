@@ -0,0 +1,146 @@
+import os
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+JOB_RETENTION_SECONDS = 3600
+
+_worker_generator = None
+
+
+def _render_report(kind, payload, path):
+    global _worker_generator
+    if _worker_generator is None:
+        from utils.report_generator import ReportGenerator
+        _worker_generator = ReportGenerator()
+    if kind == 'single':
+        _worker_generator.generate_single_session_report(payload['session'], path)
+    else:
+        _worker_generator.generate_combined_report(
+            payload['sessions'], payload['period'], path, payload.get('summary')
+        )
+
+
+# Renders PDF reports in a bounded process pool so doc.build() never runs on
+# the web worker. Identical pending jobs (same cache key) share one render, and
+# finished PDFs land in the report cache. spawn/sleep are the Socket.IO
+# background-task helpers used to wait for renders without blocking the hub.
+# `store` (a state backend map) publishes job status so any worker can answer
+# status and download requests; pending jobs and listeners stay local.
+class ReportJobManager:
+    def __init__(self, cache, spawn, sleep, workers=None, store=None):
+        if workers is None:
+            workers = int(os.getenv('REPORT_WORKERS', '1'))
+        self.cache = cache
+        self.spawn = spawn
+        self.sleep = sleep
+        self.workers = max(1, workers)
+        self.jobs = {}
+        self.store = store if store is not None else {}
+        self._pending_by_key = {}
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            ctx = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._executor
+
+    def submit(self, kind, payload, cache_key, download_name, notify=None):
+        self._prune()
+        job_id = self._pending_by_key.get(cache_key)
+        if job_id is not None:
+            job = self.jobs[job_id]
+            if notify is not None:
+                job['_listeners'].append(notify)
+            return job
+
+        job = {
+            'job_id': f"job_{uuid.uuid4().hex[:12]}",
+            'kind': kind,
+            'status': 'queued',
+            'cache_key': cache_key,
+            'download_name': download_name,
+            'created_at': time.time(),
+            'finished_at': None,
+            'error': None,
+            '_listeners': [notify] if notify is not None else []
+        }
+        self.jobs[job['job_id']] = job
+        self._publish(job)
+
+        if self.cache.get(cache_key):
+            self._finish(job, 'done')
+            return job
+
+        self._pending_by_key[cache_key] = job['job_id']
+        tmp_path = self.cache.tmp_path(cache_key)
+        try:
+            try:
+                future = self._get_executor().submit(_render_report, kind, payload, tmp_path)
+            except BrokenProcessPool:
+                self._executor = None
+                future = self._get_executor().submit(_render_report, kind, payload, tmp_path)
+        except Exception as e:
+            # Otherwise later identical requests would join a job that never runs.
+            print(f"Report job {job['job_id']} could not be queued: {e}")
+            self._pending_by_key.pop(cache_key, None)
+            job['error'] = str(e)
+            self._finish(job, 'failed')
+            return job
+        job['status'] = 'running'
+        self._publish(job)
+        self.spawn(self._wait, job, future, tmp_path)
+        return job
+
+    def _wait(self, job, future, tmp_path):
+        try:
+            while not future.done():
+                self.sleep(0.05)
+            future.result()
+            self.cache.commit(job['cache_key'], tmp_path)
+            self._finish(job, 'done')
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._executor = None
+            print(f"Report job {job['job_id']} failed: {e}")
+            self.cache.discard(tmp_path)
+            job['error'] = str(e)
+            self._finish(job, 'failed')
+        finally:
+            self._pending_by_key.pop(job['cache_key'], None)
+
+    def _finish(self, job, status):
+        job['status'] = status
+        job['finished_at'] = time.time()
+        self._publish(job)
+        listeners = job['_listeners']
+        job['_listeners'] = []
+        for notify in listeners:
+            try:
+                notify(self.describe(job))
+            except Exception as e:
+                print(f"Report job notification failed: {e}")
+
+    def _publish(self, job):
+        self.store[job['job_id']] = {k: v for k, v in job.items() if not k.startswith('_')}
+
+    def get(self, job_id):
+        return self.jobs.get(job_id) or self.store.get(job_id)
+
+    def path(self, job):
+        if job['status'] != 'done':
+            return None
+        return self.cache.get(job['cache_key'])
+
+    def describe(self, job):
+        return {k: v for k, v in job.items() if not k.startswith('_') and k != 'cache_key'}
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j for j, job in self.jobs.items()
+                       if job['finished_at'] is not None and job['finished_at'] < cutoff]:
+            del self.jobs[job_id]
+            self.store.pop(job_id, None)
@@ -0,0 +1,65 @@
+# Report statistics without the ReportLab dependency, so the API process can
+# summarise periods and compute report cache keys without loading the PDF
+# toolkit; only rendering (utils/report_generator.py) needs it.
+
+# Bump whenever the report layout changes so cached PDFs are re-rendered.
+REPORT_TEMPLATE_VERSION = 1
+
+
+# Running totals for the combined report, filled in a single pass over either
+# raw sessions or daily rollup buckets. summary() is a plain dict so it can be
+# hashed for the report cache and pickled to the render workers.
+class SessionStats:
+    def __init__(self):
+        self.total_sessions = 0
+        self.total_minutes = 0
+        self.focus_sum = 0
+        self.completed = 0
+        self.total_breaks = 0
+        self.subjects = {}
+
+    def add_session(self, session):
+        self.total_sessions += 1
+        self.total_minutes += session['duration_actual']
+        self.focus_sum += session['focus_score']
+        if session['completed']:
+            self.completed += 1
+        self.total_breaks += len(session['breaks'])
+        subject = session['subject']
+        self.subjects[subject] = self.subjects.get(subject, 0) + 1
+
+    def add_bucket(self, bucket):
+        self.total_sessions += bucket['session_count']
+        self.total_minutes += bucket['total_minutes']
+        self.focus_sum += bucket['focus_sum']
+        self.completed += bucket['completed_count']
+        self.total_breaks += bucket['break_count']
+        for subject, count in bucket['subjects'].items():
+            self.subjects[subject] = self.subjects.get(subject, 0) + count
+
+    def summary(self):
+        total = self.total_sessions
+        return {
+            'total_sessions': total,
+            'total_minutes': self.total_minutes,
+            'avg_focus': self.focus_sum / total if total > 0 else 0,
+            'completed': self.completed,
+            'completion_rate': (self.completed / total) * 100 if total > 0 else 0,
+            'total_breaks': self.total_breaks,
+            'subjects': self.subjects,
+            'most_studied': max(self.subjects, key=self.subjects.get) if self.subjects else 'N/A'
+        }
+
+
+def summarize_sessions(sessions):
+    stats = SessionStats()
+    for s in sessions:
+        stats.add_session(s)
+    return stats.summary()
+
+
+def summarize_buckets(buckets):
+    stats = SessionStats()
+    for b in buckets:
+        stats.add_bucket(b)
+    return stats.summary()
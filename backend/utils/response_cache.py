@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import glob
+import hashlib
+import uuid
+import threading
+from concurrent.futures import Future
+
+
+# Disk cache for model responses, keyed by a hash of the normalized prompt
+# (whitespace collapsed, case folded) and the model name, so identical
+# requests within max_age_seconds are answered without an upstream call.
+# Entries are JSON files, which survive restarts and are evicted by age and
+# total size like the report cache. Concurrent misses for the same key are
+# coalesced: the first caller generates, the others wait for its result.
+class ResponseCache:
+    def __init__(self, directory, max_bytes, max_age_seconds):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def key(self, prompt, model_name):
+        normalized = ' '.join(prompt.split()).casefold()
+        digest = hashlib.sha256()
+        digest.update(model_name.encode())
+        digest.update(b'\0')
+        digest.update(normalized.encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key):
+        path = self.path(key)
+        # The TTL counts from when the entry was written, not from the mtime,
+        # which reads keep bumping.
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['created_at'] > self.max_age_seconds:
+            self._remove(path)
+            return None
+        # Bump mtime so size-based eviction drops the least recently used.
+        os.utime(path, None)
+        return entry['value']
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path(key)}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'created_at': time.time(), 'value': value}, f)
+            os.replace(tmp_path, self.path(key))
+        finally:
+            self._remove(tmp_path)
+        self.evict()
+
+    def get_or_generate(self, key, generate, sleep=time.sleep, poll_interval=0.05):
+        # generate() returns the value to cache, or raises to cache nothing;
+        # callers waiting on the same key get the same value or exception.
+        value = self.get(key)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value
+        # The lookup and registration are one step, so two threads missing
+        # at once cannot both generate.
+        with self._lock:
+            pending = self._inflight.get(key)
+            leader = pending is None
+            if leader:
+                self.stats['misses'] += 1
+                pending = self._inflight[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            while not pending.done():
+                sleep(poll_interval)
+            return pending.result()
+
+        try:
+            value = generate()
+            self.put(key, value)
+            pending.set_result(value)
+            return value
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,242 @@
+import os
+import json
+import glob
+import time
+from datetime import datetime
+from utils.detection_log import DetectionLog, FocusSamples
+
+
+def apply_record(sessions, record):
+    # Applies one journal record to the in-memory sessions dict. The routes
+    # mutate active_sessions only through this, so replaying a journal
+    # rebuilds exactly the state the live process had.
+    session_id = record['session_id']
+    op = record['op']
+    if op == 'start':
+        sessions[session_id] = record['session']
+        sessions[session_id]['detections'] = DetectionLog()
+        sessions[session_id]['samples'] = FocusSamples()
+        return
+    session = sessions.get(session_id)
+    if session is None:
+        return
+    if op == 'pause':
+        session['pauses'].append(record['entry'])
+    elif op == 'resume':
+        session['pauses'].append(record['entry'])
+        session['total_paused_time'] += record['paused_seconds']
+    elif op == 'break':
+        session['breaks'].append(record['entry'])
+    elif op == 'detection':
+        session['detections'].append(
+            record['t'], record['emotion'], record['distraction_level'], record['suggestion']
+        )
+        session['distraction_warnings'] += record['distraction_warnings']
+        session['posture_warnings'] += record['posture_warnings']
+    elif op == 'sample':
+        session['samples'].append(record['t'], record['distraction'], record['slouching'])
+    elif op == 'help':
+        session['help_requests'] += 1
+        session['events'].append(record['entry'])
+    elif op == 'end':
+        del sessions[session_id]
+
+
+# Append-only JSON Lines log per active session (data/journal/<id>.jsonl).
+# Records are written through a buffered file handle and flushed + fsynced in
+# batches every flush_interval_ms by a background loop; start records are
+# synced immediately. The journal is deleted once the finished session is in
+# the session store. spawn/sleep are the Socket.IO background-task helpers.
+class SessionJournal:
+    def __init__(self, spawn, sleep, directory='data/journal', flush_interval_ms=None):
+        if flush_interval_ms is None:
+            flush_interval_ms = float(os.getenv('JOURNAL_FLUSH_MS', '200'))
+        self.spawn = spawn
+        self.sleep = sleep
+        self.directory = directory
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._files = {}
+        self._dirty = set()
+        self._flushing = False
+
+    def path(self, session_id):
+        return os.path.join(self.directory, f'{session_id}.jsonl')
+
+    def append(self, session_id, op, sync=False, **fields):
+        record = {'op': op, 'session_id': session_id, 't': time.time(), **fields}
+        handle = self._files.get(session_id)
+        if handle is None:
+            os.makedirs(self.directory, exist_ok=True)
+            handle = open(self.path(session_id), 'a', encoding='utf-8')
+            self._files[session_id] = handle
+        handle.write(json.dumps(record, separators=(',', ':')) + '\n')
+        if sync:
+            self._sync(session_id, handle)
+        else:
+            self._dirty.add(session_id)
+            if not self._flushing:
+                self._flushing = True
+                self.spawn(self._flush_loop)
+        return record
+
+    def remove(self, session_id):
+        handle = self._files.pop(session_id, None)
+        self._dirty.discard(session_id)
+        if handle is not None:
+            handle.close()
+        try:
+            os.remove(self.path(session_id))
+        except OSError:
+            pass
+
+    def flush(self):
+        for session_id in list(self._dirty):
+            handle = self._files.get(session_id)
+            if handle is not None:
+                self._sync(session_id, handle)
+        self._dirty.clear()
+
+    def _sync(self, session_id, handle):
+        handle.flush()
+        os.fsync(handle.fileno())
+        self._dirty.discard(session_id)
+
+    def _flush_loop(self):
+        try:
+            while self._dirty:
+                self.sleep(self.flush_interval)
+                self.flush()
+        finally:
+            self._flushing = False
+
+    def replay(self):
+        # Rebuilds {session_id: (session, last_record_time)} from every
+        # journal on disk. A torn final line from a crash mid-write is ignored.
+        sessions = {}
+        last_seen = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.jsonl'))):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    apply_record(sessions, record)
+                    last_seen[record['session_id']] = record['t']
+        return {session_id: (session, datetime.fromtimestamp(last_seen[session_id]))
+                for session_id, session in sessions.items()}
+
+
+JOURNAL_LOG = 'session_journal'
+# Ended sessions leave one 'end' record so other workers drop their copy;
+# these are cleared on replay once every worker has had time to see them.
+END_RECORD_RETENTION_SECONDS = 3600
+
+
+# Session journal kept in a shared state backend (see utils/state_backend.py)
+# instead of local files, so every worker and node sees the same sessions.
+# Records are written synchronously; with detection events per episode and
+# samples once a second this is a few small writes per session per second.
+class SharedSessionJournal:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def append(self, session_id, op, sync=False, **fields):
+        record = {'op': op, 'session_id': session_id, 't': time.time(), **fields}
+        self.backend.append(JOURNAL_LOG, session_id, record)
+        return record
+
+    def remove(self, session_id):
+        seq = self.backend.append(JOURNAL_LOG, session_id, {
+            'op': 'end', 'session_id': session_id, 't': time.time()
+        })
+        self.backend.trim(JOURNAL_LOG, session_id, keep=seq)
+
+    def replay(self):
+        sessions = {}
+        last_seen = {}
+        cutoff = time.time() - END_RECORD_RETENTION_SECONDS
+        for session_id in self.backend.keys(JOURNAL_LOG):
+            records = self.backend.read(JOURNAL_LOG, session_id)
+            if records and records[-1][1]['op'] == 'end':
+                if records[-1][1]['t'] < cutoff:
+                    self.backend.trim(JOURNAL_LOG, session_id)
+                continue
+            for _, record in records:
+                apply_record(sessions, record)
+                last_seen[session_id] = record['t']
+        return {session_id: (session, datetime.fromtimestamp(last_seen[session_id]))
+                for session_id, session in sessions.items()}
+
+
+# active_sessions for a single process: the journal records are applied
+# directly to this dict.
+class LocalSessions(dict):
+    def apply(self, record):
+        apply_record(self, record)
+
+    def restore(self, session_id, session_data):
+        self[session_id] = session_data
+
+    def discard(self, session_id):
+        self.pop(session_id, None)
+
+
+# active_sessions backed by a SharedSessionJournal. Each process keeps its own
+# copy of the sessions it touches and brings it up to date by applying the
+# records appended since it last looked, at most every refresh_interval_ms
+# for reads and immediately after its own writes.
+class SharedSessions:
+    def __init__(self, backend, refresh_interval_ms=None):
+        if refresh_interval_ms is None:
+            refresh_interval_ms = float(os.getenv('STATE_REFRESH_MS', '500'))
+        self.backend = backend
+        self.refresh_interval = refresh_interval_ms / 1000.0
+        self._sessions = {}
+        self._seen = {}
+        self._checked = {}
+
+    def refresh(self, session_id, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked.get(session_id, float('-inf')) < self.refresh_interval:
+            return
+        self._checked[session_id] = now
+        for seq, record in self.backend.read(JOURNAL_LOG, session_id, self._seen.get(session_id, 0)):
+            if record['op'] == 'end':
+                self._sessions.pop(session_id, None)
+            else:
+                apply_record(self._sessions, record)
+            self._seen[session_id] = seq
+        if session_id not in self._sessions:
+            self._seen.pop(session_id, None)
+            if len(self._checked) > 10000:
+                self._checked = {k: v for k, v in self._checked.items() if k in self._sessions}
+
+    def apply(self, record):
+        # The record is already in the shared log; reading it back keeps the
+        # order consistent with records other workers appended meanwhile.
+        self.refresh(record['session_id'], force=True)
+
+    def restore(self, session_id, session_data):
+        # Nothing to do: sessions are loaded from the shared log on access.
+        pass
+
+    def discard(self, session_id):
+        self._sessions.pop(session_id, None)
+        self.refresh(session_id, force=True)
+
+    def __contains__(self, session_id):
+        if session_id is None:
+            return False
+        self.refresh(session_id)
+        return session_id in self._sessions
+
+    def __getitem__(self, session_id):
+        self.refresh(session_id)
+        return self._sessions[session_id]
+
+    def get(self, session_id, default=None):
+        if session_id is None:
+            return default
+        self.refresh(session_id)
+        return self._sessions.get(session_id, default)
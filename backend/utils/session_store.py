@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import glob
+import base64
+from sqlalchemy import (
+    create_engine,
+    inspect,
+    text,
+    MetaData,
+    Table,
+    Column,
+    Index,
+    String,
+    Text,
+    Integer,
+    Float,
+    LargeBinary,
+    select,
+    delete,
+    insert,
+    and_,
+    or_,
+    func
+)
+from utils.detection_log import DetectionLog, FocusSamples, merge_events
+
+DEFAULT_DATABASE_URL = 'sqlite:///data/focusmate.db'
+LEGACY_SESSIONS_GLOB = 'data/sessions/*.json'
+# Per-session lists that can grow large; stored apart from the summary so
+# list views can skip reading them.
+DETAIL_FIELDS = ('events', 'pauses')
+
+metadata = MetaData()
+
+sessions_table = Table(
+    'sessions',
+    metadata,
+    Column('session_id', String, primary_key=True),
+    Column('user_id', String, index=True),
+    Column('user_email', String, index=True),
+    Column('start_time', String, index=True),
+    Column('document', Text, nullable=False),
+    Column('details', Text),
+    # Detection events as a DetectionLog sidecar (see utils/detection_log.py);
+    # merged back into `events` only when events are requested.
+    Column('detections', LargeBinary),
+    # FocusSamples sidecar, only read for focus timelines.
+    Column('samples', LargeBinary),
+    Index('ix_sessions_start_id', 'start_time', 'session_id'),
+    Index('ix_sessions_user_start', 'user_id', 'start_time')
+)
+
+# Running per-user totals, updated whenever a session is saved, so stats
+# for a user never require reading their sessions.
+user_stats_table = Table(
+    'user_stats',
+    metadata,
+    Column('user_id', String, primary_key=True),
+    Column('session_count', Integer, nullable=False, default=0),
+    Column('total_minutes', Float, nullable=False, default=0),
+    Column('focus_sum', Float, nullable=False, default=0),
+    Column('subjects', Text, nullable=False, default='{}')
+)
+
+# Per-user, per-day buckets (keyed by the date of start_time) for period
+# reports, so a month summary reads at most ~30 rows per user.
+daily_stats_table = Table(
+    'daily_stats',
+    metadata,
+    Column('user_id', String, primary_key=True),
+    Column('day', String, primary_key=True),
+    Column('session_count', Integer, nullable=False, default=0),
+    Column('total_minutes', Float, nullable=False, default=0),
+    Column('focus_sum', Float, nullable=False, default=0),
+    Column('completed_count', Integer, nullable=False, default=0),
+    Column('break_count', Integer, nullable=False, default=0),
+    Column('subjects', Text, nullable=False, default='{}'),
+    Index('ix_daily_stats_day', 'day')
+)
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['start_time'], row['session_id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        start_time, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return start_time, session_id
+
+
+# Saved study sessions, one row per session. The session summary is kept as
+# JSON in `document` and the bulky lists in `details`; the columns used for
+# lookups are copied out and indexed.
+class SessionStore:
+    def __init__(self, database_url=None):
+        if database_url is None:
+            database_url = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL)
+        if database_url.startswith('sqlite:///'):
+            db_dir = os.path.dirname(database_url[len('sqlite:///'):])
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+        self.engine = create_engine(database_url, future=True)
+        existing_tables = set(inspect(self.engine).get_table_names())
+        metadata.create_all(self.engine)
+        self._upgrade_schema(existing_tables)
+
+    def _upgrade_schema(self, existing_tables):
+        columns = {c['name'] for c in inspect(self.engine).get_columns('sessions')}
+        if 'details' not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE sessions ADD COLUMN details TEXT'))
+        if 'detections' not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE sessions ADD COLUMN detections BLOB'))
+        if 'samples' not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(text('ALTER TABLE sessions ADD COLUMN samples BLOB'))
+        for index in sessions_table.indexes:
+            index.create(self.engine, checkfirst=True)
+        rollup_tables = {'user_stats', 'daily_stats'}
+        if 'sessions' in existing_tables and not rollup_tables <= existing_tables:
+            rebuilt = self.rebuild_rollups()
+            print(f"Built statistics rollups for {rebuilt} user(s)")
+
+    def save_session(self, session_data):
+        # Detection events go to the binary sidecar. Sessions without a
+        # DetectionLog (legacy JSON) have theirs split out of `events`.
+        detections = session_data.get('detections')
+        events = session_data.get('events', [])
+        if detections is None:
+            detections, events = DetectionLog.from_events(events)
+        samples = session_data.get('samples')
+        summary = {k: v for k, v in session_data.items()
+                   if k not in DETAIL_FIELDS and k not in ('detections', 'samples')}
+        details = {k: session_data[k] for k in DETAIL_FIELDS if k in session_data}
+        details['events'] = events
+        row = {
+            'session_id': session_data['session_id'],
+            'user_id': session_data.get('user_id'),
+            'user_email': session_data.get('user_email'),
+            'start_time': session_data.get('start_time'),
+            'document': json.dumps(summary),
+            'details': json.dumps(details),
+            'detections': detections.to_bytes() if len(detections) else None,
+            'samples': samples.to_bytes() if samples is not None and len(samples) else None
+        }
+        with self.engine.begin() as conn:
+            previous = conn.execute(
+                select(sessions_table.c.document).where(sessions_table.c.session_id == row['session_id'])
+            ).scalar()
+            if previous:
+                self._apply_rollups(conn, json.loads(previous), -1)
+            conn.execute(delete(sessions_table).where(sessions_table.c.session_id == row['session_id']))
+            conn.execute(insert(sessions_table).values(**row))
+            self._apply_rollups(conn, summary, 1)
+
+    def _apply_rollups(self, conn, session_data, sign):
+        self._apply_user_stats(conn, session_data, sign)
+        self._apply_daily_stats(conn, session_data, sign)
+
+    def _apply_user_stats(self, conn, session_data, sign):
+        user_id = session_data.get('user_id')
+        if user_id is None:
+            return
+        stats = conn.execute(
+            select(user_stats_table).where(user_stats_table.c.user_id == user_id)
+        ).first()
+        if stats is None:
+            stats = {'session_count': 0, 'total_minutes': 0, 'focus_sum': 0, 'subjects': '{}'}
+        else:
+            stats = dict(stats._mapping)
+        subjects = json.loads(stats['subjects'])
+        subject = session_data.get('subject') or 'Unknown'
+        subjects[subject] = subjects.get(subject, 0) + sign
+        if subjects[subject] <= 0:
+            del subjects[subject]
+        values = {
+            'session_count': stats['session_count'] + sign,
+            'total_minutes': stats['total_minutes'] + sign * (session_data.get('duration_actual') or 0),
+            'focus_sum': stats['focus_sum'] + sign * (session_data.get('focus_score') or 0),
+            'subjects': json.dumps(subjects)
+        }
+        conn.execute(delete(user_stats_table).where(user_stats_table.c.user_id == user_id))
+        if values['session_count'] > 0:
+            conn.execute(insert(user_stats_table).values(user_id=user_id, **values))
+
+    def _apply_daily_stats(self, conn, session_data, sign):
+        start_time = session_data.get('start_time')
+        if not start_time:
+            return
+        user_id = session_data.get('user_id') or ''
+        day = start_time[:10]
+        key = and_(daily_stats_table.c.user_id == user_id, daily_stats_table.c.day == day)
+        bucket = conn.execute(select(daily_stats_table).where(key)).first()
+        if bucket is None:
+            bucket = {'session_count': 0, 'total_minutes': 0, 'focus_sum': 0,
+                      'completed_count': 0, 'break_count': 0, 'subjects': '{}'}
+        else:
+            bucket = dict(bucket._mapping)
+        subjects = json.loads(bucket['subjects'])
+        subject = session_data.get('subject') or 'Unknown'
+        subjects[subject] = subjects.get(subject, 0) + sign
+        if subjects[subject] <= 0:
+            del subjects[subject]
+        values = {
+            'session_count': bucket['session_count'] + sign,
+            'total_minutes': bucket['total_minutes'] + sign * (session_data.get('duration_actual') or 0),
+            'focus_sum': bucket['focus_sum'] + sign * (session_data.get('focus_score') or 0),
+            'completed_count': bucket['completed_count'] + (sign if session_data.get('completed') else 0),
+            'break_count': bucket['break_count'] + sign * len(session_data.get('breaks') or []),
+            'subjects': json.dumps(subjects)
+        }
+        conn.execute(delete(daily_stats_table).where(key))
+        if values['session_count'] > 0:
+            conn.execute(insert(daily_stats_table).values(user_id=user_id, day=day, **values))
+
+    def daily_buckets(self, since_day, user_id=None):
+        # Buckets from since_day (YYYY-MM-DD) onwards, oldest first. Without a
+        # user_id the buckets of all users are returned.
+        query = select(daily_stats_table).where(daily_stats_table.c.day >= since_day)
+        if user_id is not None:
+            query = query.where(daily_stats_table.c.user_id == user_id)
+        query = query.order_by(daily_stats_table.c.day)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        buckets = []
+        for row in rows:
+            bucket = dict(row._mapping)
+            bucket['subjects'] = json.loads(bucket['subjects'])
+            buckets.append(bucket)
+        return buckets
+
+    def get_user_stats(self, user_id):
+        query = select(user_stats_table).where(user_stats_table.c.user_id == user_id)
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        if row is None:
+            return None
+        stats = dict(row._mapping)
+        stats['subjects'] = json.loads(stats['subjects'])
+        return stats
+
+    def rebuild_rollups(self):
+        # Recomputes every rollup (per-user totals and daily buckets) from the
+        # saved sessions.
+        with self.engine.begin() as conn:
+            conn.execute(delete(user_stats_table))
+            conn.execute(delete(daily_stats_table))
+            for document in conn.execute(select(sessions_table.c.document)).scalars().all():
+                self._apply_rollups(conn, json.loads(document), 1)
+            return conn.execute(select(func.count()).select_from(user_stats_table)).scalar()
+
+    def _load(self, row, with_details=True, with_events=True):
+        session_data = json.loads(row.document)
+        if with_details and row.details:
+            session_data.update(json.loads(row.details))
+        if with_events and row.detections:
+            session_data['events'] = merge_events(
+                DetectionLog.from_bytes(row.detections), session_data.get('events', [])
+            )
+        return session_data
+
+    def get_session(self, session_id):
+        query = (
+            select(sessions_table.c.document, sessions_table.c.details, sessions_table.c.detections)
+            .where(sessions_table.c.session_id == session_id)
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        return self._load(row) if row else None
+
+    def get_timeline_source(self, session_id):
+        # (start_time, DetectionLog, FocusSamples) of a saved session, read
+        # without decoding its JSON document or details.
+        query = (
+            select(sessions_table.c.start_time, sessions_table.c.detections, sessions_table.c.samples)
+            .where(sessions_table.c.session_id == session_id)
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        if row is None:
+            return None
+        detections = DetectionLog.from_bytes(row.detections) if row.detections else None
+        samples = FocusSamples.from_bytes(row.samples) if row.samples else None
+        return row.start_time, detections, samples
+
+    def page_sessions(self, user_id=None, start=None, end=None, limit=None,
+                      cursor=None, fields=None, exclude=None):
+        # Newest first, keyset-paginated on (start_time, session_id) so every
+        # page is an index range scan no matter how many sessions exist.
+        exclude = set(exclude or ())
+        if fields:
+            exclude |= {f for f in DETAIL_FIELDS if f not in fields}
+        with_details = not all(f in exclude for f in DETAIL_FIELDS)
+        with_events = 'events' not in exclude
+        columns = [sessions_table.c.session_id, sessions_table.c.start_time, sessions_table.c.document]
+        if with_details:
+            columns.append(sessions_table.c.details)
+        if with_events:
+            columns.append(sessions_table.c.detections)
+        query = select(*columns)
+        if user_id is not None:
+            query = query.where(sessions_table.c.user_id == user_id)
+        if start is not None:
+            query = query.where(sessions_table.c.start_time >= start)
+        if end is not None:
+            query = query.where(sessions_table.c.start_time < end)
+        if cursor is not None:
+            cursor_start, cursor_id = decode_cursor(cursor)
+            query = query.where(or_(
+                sessions_table.c.start_time < cursor_start,
+                and_(sessions_table.c.start_time == cursor_start,
+                     sessions_table.c.session_id < cursor_id)
+            ))
+        query = query.order_by(sessions_table.c.start_time.desc(), sessions_table.c.session_id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]._mapping)
+        sessions = []
+        for row in rows:
+            session_data = self._load(row, with_details, with_events)
+            if fields:
+                session_data = {k: v for k, v in session_data.items() if k in fields}
+            elif exclude:
+                session_data = {k: v for k, v in session_data.items() if k not in exclude}
+            sessions.append(session_data)
+        return sessions, next_cursor
+
+    def compact_events(self):
+        # Moves detection events of sessions saved before the sidecar existed
+        # out of the JSON details.
+        query = select(sessions_table.c.session_id).where(sessions_table.c.detections.is_(None))
+        with self.engine.connect() as conn:
+            session_ids = conn.execute(query).scalars().all()
+        compacted = 0
+        for session_id in session_ids:
+            session_data = self.get_session(session_id)
+            if any(e.get('type') == 'detection' for e in session_data.get('events', [])):
+                self.save_session(session_data)
+                compacted += 1
+        return compacted
+
+    def find_user_id_by_email(self, email):
+        query = (
+            select(sessions_table.c.user_id)
+            .where(sessions_table.c.user_email == email)
+            .limit(1)
+        )
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalar()
+
+    def count(self):
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(sessions_table)).scalar()
+
+    def import_json_sessions(self, pattern=LEGACY_SESSIONS_GLOB):
+        with self.engine.connect() as conn:
+            existing = set(conn.execute(select(sessions_table.c.session_id)).scalars())
+        imported = 0
+        for file_path in glob.glob(pattern):
+            try:
+                with open(file_path, 'r') as f:
+                    session_data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Skipping {file_path}: {e}")
+                continue
+            if session_data.get('session_id') in existing:
+                continue
+            self.save_session(session_data)
+            imported += 1
+        return imported
+
+
+_session_store = None
+
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore()
+    return _session_store
+
+
+if __name__ == '__main__':
+    # python -m utils.session_store migrate [glob]   import legacy data/sessions/*.json
+    # python -m utils.session_store rebuild-stats    recompute per-user and daily rollups
+    # python -m utils.session_store compact-events   move old detection events to the sidecar
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command == 'migrate':
+        pattern = sys.argv[2] if len(sys.argv) > 2 else LEGACY_SESSIONS_GLOB
+        count = get_session_store().import_json_sessions(pattern)
+        print(f"Imported {count} session(s) from {pattern}")
+    elif command == 'rebuild-stats':
+        count = get_session_store().rebuild_rollups()
+        print(f"Rebuilt statistics for {count} user(s)")
+    elif command == 'compact-events':
+        count = get_session_store().compact_events()
+        print(f"Compacted detection events of {count} session(s)")
+    else:
+        print("Usage: python -m utils.session_store migrate [glob] | rebuild-stats | compact-events")
+        sys.exit(1)
@@ -0,0 +1,223 @@
+import os
+import json
+from collections.abc import MutableMapping
+from sqlalchemy import (
+    create_engine,
+    event,
+    MetaData,
+    Table,
+    Column,
+    Index,
+    String,
+    Text,
+    Integer,
+    select,
+    update,
+    delete,
+    insert,
+    and_
+)
+
+# Live application state (study rooms, friend requests, chats, active study
+# sessions, ...) goes through a state backend so the API can run as several
+# gunicorn workers or nodes. STATE_BACKEND=memory (default) keeps everything
+# in this process; STATE_BACKEND=sql shares it through a database, which can
+# be a local SQLite file when testing several workers on one machine.
+
+metadata = MetaData()
+
+state_items_table = Table(
+    'state_items',
+    metadata,
+    Column('namespace', String, primary_key=True),
+    Column('key', String, primary_key=True),
+    Column('value', Text, nullable=False)
+)
+
+# Append-only records per (log, key), e.g. the session journal in shared mode.
+state_log_table = Table(
+    'state_log',
+    metadata,
+    Column('seq', Integer, primary_key=True, autoincrement=True),
+    Column('log', String, nullable=False),
+    Column('key', String, nullable=False),
+    Column('value', Text, nullable=False),
+    Index('ix_state_log_key', 'log', 'key', 'seq'),
+    # Readers track the last seq they applied, so seqs must never be reused.
+    sqlite_autoincrement=True
+)
+
+
+# Namespaced dict used by the in-process backend. Values are the live objects;
+# callers still assign changed values back so the same code works with
+# SqlMap, which hands out copies.
+class MemoryMap(dict):
+    def update_item(self, key, fn):
+        # Applies fn to the current value (None if missing) and stores the
+        # result; a None result deletes the key.
+        value = fn(self.get(key))
+        if value is None:
+            self.pop(key, None)
+        else:
+            self[key] = value
+        return value
+
+
+class MemoryStateBackend:
+    shared = False
+
+    def __init__(self):
+        self._maps = {}
+
+    def map(self, namespace):
+        return self._maps.setdefault(namespace, MemoryMap())
+
+
+# Dict-like view of one namespace of state_items. Values round-trip through
+# JSON, so a read returns a copy and changes must be assigned back (or made
+# with update_item, which is atomic across processes).
+class SqlMap(MutableMapping):
+    def __init__(self, backend, namespace):
+        self.engine = backend.engine
+        self.namespace = namespace
+
+    def _key(self, key):
+        return and_(state_items_table.c.namespace == self.namespace, state_items_table.c.key == key)
+
+    def __getitem__(self, key):
+        with self.engine.connect() as conn:
+            value = conn.execute(select(state_items_table.c.value).where(self._key(key))).scalar()
+        if value is None:
+            raise KeyError(key)
+        return json.loads(value)
+
+    def __setitem__(self, key, value):
+        with self.engine.begin() as conn:
+            self._write(conn, key, value)
+
+    def __delitem__(self, key):
+        with self.engine.begin() as conn:
+            deleted = conn.execute(delete(state_items_table).where(self._key(key))).rowcount
+        if not deleted:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        with self.engine.connect() as conn:
+            return conn.execute(select(state_items_table.c.key).where(self._key(key))).first() is not None
+
+    def __iter__(self):
+        query = select(state_items_table.c.key).where(state_items_table.c.namespace == self.namespace)
+        with self.engine.connect() as conn:
+            keys = conn.execute(query).scalars().all()
+        return iter(keys)
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def items(self):
+        query = (
+            select(state_items_table.c.key, state_items_table.c.value)
+            .where(state_items_table.c.namespace == self.namespace)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [(row.key, json.loads(row.value)) for row in rows]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def update_item(self, key, fn):
+        with self.engine.begin() as conn:
+            # A no-op UPDATE takes the write lock (row lock, or the database
+            # lock on SQLite) before reading, so concurrent read-modify-write
+            # cycles on an existing key from other workers cannot interleave.
+            conn.execute(
+                update(state_items_table).where(self._key(key))
+                .values(value=state_items_table.c.value)
+            )
+            current = conn.execute(select(state_items_table.c.value).where(self._key(key))).scalar()
+            value = fn(json.loads(current) if current is not None else None)
+            if value is None:
+                conn.execute(delete(state_items_table).where(self._key(key)))
+            else:
+                self._write(conn, key, value)
+        return value
+
+    def _write(self, conn, key, value):
+        conn.execute(delete(state_items_table).where(self._key(key)))
+        conn.execute(insert(state_items_table).values(
+            namespace=self.namespace, key=key, value=json.dumps(value)
+        ))
+
+
+class SqlStateBackend:
+    shared = True
+
+    def __init__(self, database_url=None):
+        if database_url is None:
+            database_url = os.getenv('STATE_DATABASE_URL') or os.getenv('DATABASE_URL', 'sqlite:///data/focusmate.db')
+        connect_args = {}
+        if database_url.startswith('sqlite:///'):
+            db_dir = os.path.dirname(database_url[len('sqlite:///'):])
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            # Several workers share the file; wait for locks instead of failing.
+            connect_args['timeout'] = 30
+        self.engine = create_engine(database_url, future=True, connect_args=connect_args)
+        if database_url.startswith('sqlite'):
+            event.listen(self.engine, 'connect', _enable_sqlite_wal)
+        metadata.create_all(self.engine)
+
+    def map(self, namespace):
+        return SqlMap(self, namespace)
+
+    def append(self, log, key, record):
+        with self.engine.begin() as conn:
+            result = conn.execute(insert(state_log_table).values(log=log, key=key, value=json.dumps(record)))
+            return result.inserted_primary_key[0]
+
+    def read(self, log, key, after=0):
+        # [(seq, record), ...] appended to (log, key) after seq `after`.
+        query = (
+            select(state_log_table.c.seq, state_log_table.c.value)
+            .where(state_log_table.c.log == log, state_log_table.c.key == key, state_log_table.c.seq > after)
+            .order_by(state_log_table.c.seq)
+        )
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        return [(row.seq, json.loads(row.value)) for row in rows]
+
+    def keys(self, log):
+        query = select(state_log_table.c.key).where(state_log_table.c.log == log).distinct()
+        with self.engine.connect() as conn:
+            return conn.execute(query).scalars().all()
+
+    def trim(self, log, key, keep=None):
+        # Deletes the records of (log, key), except seq `keep` if given.
+        query = delete(state_log_table).where(state_log_table.c.log == log, state_log_table.c.key == key)
+        if keep is not None:
+            query = query.where(state_log_table.c.seq != keep)
+        with self.engine.begin() as conn:
+            conn.execute(query)
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
+
+
+_state_backend = None
+
+
+def get_state_backend():
+    global _state_backend
+    if _state_backend is None:
+        kind = os.getenv('STATE_BACKEND', 'memory')
+        if kind == 'memory':
+            _state_backend = MemoryStateBackend()
+        elif kind == 'sql':
+            _state_backend = SqlStateBackend()
+        else:
+            raise ValueError(f'Unknown STATE_BACKEND: {kind}')
+    return _state_backend
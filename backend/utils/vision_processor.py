@@ -1,4 +1,6 @@
 import os
+import time
+from collections import OrderedDict
 os.environ['GLOG_minloglevel'] = '2'
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 
@@ -6,28 +8,180 @@ import cv2
 import mediapipe as mp
 import numpy as np
 from fer import FER
+from utils.vision_rules import (
+    empty_emotion_fields,
+    emotion_fields,
+    calculate_distraction,
+    generate_suggestion
+)
 
-class VisionProcessor:
+FACE_TILE_SIZE = 128
+# Gap between tiles in the batch mosaic; wider than FER's crop offsets so
+# neighbouring faces never bleed into each other's crops.
+FACE_TILE_GUTTER = 32
+# A tracker used this recently belongs to a session that is still streaming;
+# at the cap it is not evicted (see VisionProcessor.context).
+TRACKER_LIVE_SECONDS = 5.0
+
+
+def mosaic_tile(box, cols, count):
+    # Index of the tile in a classify_faces mosaic that contains the centre
+    # of `box` (x, y, w, h), or None if it falls in a gutter or past the end.
+    step = FACE_TILE_SIZE + FACE_TILE_GUTTER
+    cx = box[0] + box[2] / 2.0 - FACE_TILE_GUTTER
+    cy = box[1] + box[3] / 2.0 - FACE_TILE_GUTTER
+    if cx < 0 or cy < 0 or cx % step >= FACE_TILE_SIZE or cy % step >= FACE_TILE_SIZE:
+        return None
+    col, row = int(cx // step), int(cy // step)
+    if col >= cols:
+        return None
+    i = row * cols + col
+    return i if i < count else None
+
+
+# Decides which analysis stages run on a given frame. Gaze runs every frame;
+# pose and emotion change slowly, so they run every Nth/Mth frame and reuse
+# the previous result in between, unless the face appears/disappears or the
+# head moves far enough to invalidate the cached results.
+class StageScheduler:
+    def __init__(self, pose_every=None, emotion_every=None, shift_threshold=None):
+        if pose_every is None:
+            pose_every = int(os.getenv('VISION_POSE_EVERY', '3'))
+        if emotion_every is None:
+            emotion_every = int(os.getenv('VISION_EMOTION_EVERY', '5'))
+        if shift_threshold is None:
+            shift_threshold = float(os.getenv('VISION_SHIFT_THRESHOLD', '0.08'))
+        self.every = {'pose': max(1, pose_every), 'emotion': max(1, emotion_every)}
+        self.shift_threshold = shift_threshold
+        self.frame_index = 0
+        self.last_run = {'pose': None, 'emotion': None}
+        self.cache = {'pose': None, 'emotion': None}
+        self.changed = False
+        self._face_detected = None
+        self._anchor = None
+
+    def observe(self, face_detected, anchor):
+        self.frame_index += 1
+        changed = face_detected != self._face_detected
+        if not changed and anchor is not None and self._anchor is not None:
+            shift = abs(anchor[0] - self._anchor[0]) + abs(anchor[1] - self._anchor[1])
+            changed = shift > self.shift_threshold
+        if changed or anchor is None:
+            self._anchor = anchor
+        self._face_detected = face_detected
+        self.changed = changed
+        return changed
+
+    def due(self, stage):
+        last = self.last_run[stage]
+        if self.changed or last is None:
+            return True
+        return self.frame_index - last >= self.every[stage]
+
+    def store(self, stage, value):
+        self.last_run[stage] = self.frame_index
+        self.cache[stage] = value
+
+    def cached(self, stage):
+        return self.cache[stage]
+
+
+# The per-session half of the vision pipeline: FaceMesh and Pose in tracking
+# mode (static_image_mode=False) only run their detectors when they lose the
+# landmarks of the previous frame, so each session needs its own instances.
+class TrackerContext:
     def __init__(self):
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
+        self.face_mesh = mp.solutions.face_mesh.FaceMesh(
             static_image_mode=False,
             max_num_faces=1,
             refine_landmarks=True,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
+        self.pose = mp.solutions.pose.Pose(
             static_image_mode=False,
             model_complexity=1,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
-        self.emotion_detector = FER(mtcnn=True)
+        self.scheduler = StageScheduler()
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.face_mesh.close()
+        self.pose.close()
+
+
+class VisionProcessor:
+    def __init__(self, shared_face_box=None, max_trackers=None, tracker_idle_seconds=None):
+        if shared_face_box is None:
+            shared_face_box = os.getenv('VISION_SHARED_FACE_BOX', '1') == '1'
+        if max_trackers is None:
+            max_trackers = int(os.getenv('VISION_MAX_TRACKERS') or os.getenv('VISION_BUFFER_SESSIONS', '32'))
+        if tracker_idle_seconds is None:
+            tracker_idle_seconds = float(os.getenv('VISION_TRACKER_IDLE_SECONDS', '60'))
+        # When enabled, FER classifies the face FaceMesh already located
+        # instead of running its own MTCNN detector on the full frame.
+        self.shared_face_box = shared_face_box
+        self.mp_face_mesh = mp.solutions.face_mesh
+        self.mp_pose = mp.solutions.pose
+        # session_key -> TrackerContext, least recently used first. Capped at
+        # max_trackers, since every context holds its own MediaPipe graphs;
+        # sessions beyond the cap share the overflow context.
+        self.max_trackers = max(1, max_trackers)
+        self.tracker_idle_seconds = tracker_idle_seconds
+        self._contexts = OrderedDict()
+        self._overflow = None
+        self._overflow_key = None
+        self.emotion_detector = FER(mtcnn=not shared_face_box)
         print("Vision Processor initialized")
 
-    def analyze_frame(self, frame):
+    def context(self, session_key=None):
+        now = time.monotonic()
+        # Contexts are in use order, so idle ones are at the front.
+        while self._contexts and self.tracker_idle_seconds > 0:
+            key, oldest = next(iter(self._contexts.items()))
+            if key == session_key or now - oldest.last_used < self.tracker_idle_seconds:
+                break
+            del self._contexts[key]
+            oldest.close()
+        context = self._contexts.get(session_key)
+        if context is None:
+            if len(self._contexts) >= self.max_trackers:
+                key, oldest = next(iter(self._contexts.items()))
+                if now - oldest.last_used < TRACKER_LIVE_SECONDS:
+                    # Every tracker is streaming; evicting one would have the
+                    # sessions take turns re-running detection on every frame.
+                    return self._overflow_context(session_key, now)
+                del self._contexts[key]
+                oldest.close()
+            context = TrackerContext()
+            self._contexts[session_key] = context
+        else:
+            self._contexts.move_to_end(session_key)
+        context.last_used = now
+        return context
+
+    def _overflow_context(self, session_key, now):
+        # Shared by the sessions beyond the cap. Its scheduler starts over
+        # whenever another session uses it, so no session is handed the
+        # cached pose or emotion of another.
+        if self._overflow is None:
+            self._overflow = TrackerContext()
+        if self._overflow_key != session_key:
+            self._overflow.scheduler = StageScheduler()
+            self._overflow_key = session_key
+        self._overflow.last_used = now
+        return self._overflow
+
+    def release(self, session_key):
+        context = self._contexts.pop(session_key, None)
+        if context is not None:
+            context.close()
+        if self._overflow_key == session_key:
+            self._overflow_key = None
+
+    def analyze_frame(self, frame, rgb_frame=None, defer_emotion=False, session_key=None):
         results = {
             'face_detected': False,
             'emotion': None,
@@ -39,26 +193,122 @@ class VisionProcessor:
             'is_tired': False,
             'suggestion': None
         }
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        face_results = self.face_mesh.process(rgb_frame)
+        if rgb_frame is None:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        context = self.context(session_key)
+        face_results = context.face_mesh.process(rgb_frame)
+        anchor = None
+        face_box = None
         if face_results.multi_face_landmarks:
             results['face_detected'] = True
             landmarks = face_results.multi_face_landmarks[0]
             results['looking_away'] = self._check_looking_away(landmarks, frame.shape)
-        pose_results = self.pose.process(rgb_frame)
-        if pose_results.pose_landmarks:
-            results['posture'] = self._analyze_posture(pose_results.pose_landmarks)
+            nose_tip = landmarks.landmark[1]
+            anchor = (nose_tip.x, nose_tip.y)
+            face_box = self._face_box(landmarks, frame.shape)
+        scheduler = context.scheduler
+        scheduler.observe(results['face_detected'], anchor)
+        if scheduler.due('pose'):
+            posture = 'unknown'
+            pose_results = context.pose.process(rgb_frame)
+            if pose_results.pose_landmarks:
+                posture = self._analyze_posture(pose_results.pose_landmarks)
+            scheduler.store('pose', posture)
+        results['posture'] = scheduler.cached('pose')
+        defer_emotion = defer_emotion and self.shared_face_box
+        if scheduler.due('emotion'):
+            if defer_emotion:
+                # The caller classifies the face tile (batched with other
+                # sessions) and keeps the emotion between scheduled runs.
+                if face_box is not None:
+                    results['face_tile'] = self._face_tile(frame, face_box)
+                scheduler.store('emotion', None)
+            else:
+                scheduler.store('emotion', self._detect_emotion(frame, face_box))
+        if defer_emotion:
+            results['emotion_deferred'] = True
+        else:
+            results.update(scheduler.cached('emotion'))
+        results['distraction_level'] = calculate_distraction(results)
+        results['suggestion'] = generate_suggestion(results)
+        return results
+
+    def _detect_emotion(self, frame, face_box=None):
+        if self.shared_face_box:
+            if face_box is None:
+                return empty_emotion_fields()
+            return self.classify_faces([self._face_tile(frame, face_box)])[0]
         emotion_data = self.emotion_detector.detect_emotions(frame)
         if emotion_data and len(emotion_data) > 0:
-            emotions = emotion_data[0]['emotions']
-            dominant_emotion = max(emotions, key=emotions.get)
-            results['emotion'] = dominant_emotion
-            results['emotion_confidence'] = emotions[dominant_emotion]
-            results['needs_help'] = self._check_needs_help(emotions)
-            results['is_tired'] = self._check_tired(emotions)
-        results['distraction_level'] = self._calculate_distraction(results)
-        results['suggestion'] = self._generate_suggestion(results)
-        return results
+            return emotion_fields(emotion_data[0]['emotions'])
+        return empty_emotion_fields()
+
+    def classify_faces(self, tiles):
+        # Lays the face tiles out in one mosaic and hands FER every face
+        # rectangle at once, so the emotion CNN runs a single batched
+        # forward pass however many faces there are.
+        count = len(tiles)
+        if count == 0:
+            return []
+        cols = int(np.ceil(np.sqrt(count)))
+        rows = int(np.ceil(count / cols))
+        step = FACE_TILE_SIZE + FACE_TILE_GUTTER
+        mosaic = np.zeros(
+            (FACE_TILE_GUTTER + rows * step, FACE_TILE_GUTTER + cols * step, 3),
+            dtype=np.uint8
+        )
+        rectangles = []
+        for i, (tile, (bx, by, bw, bh)) in enumerate(tiles):
+            row, col = divmod(i, cols)
+            ox = FACE_TILE_GUTTER + col * step
+            oy = FACE_TILE_GUTTER + row * step
+            mosaic[oy:oy + FACE_TILE_SIZE, ox:ox + FACE_TILE_SIZE] = tile
+            rectangles.append((ox + bx, oy + by, bw, bh))
+        emotion_data = self.emotion_detector.detect_emotions(mosaic, face_rectangles=rectangles)
+        # FER skips faces it cannot crop, so results are matched back to their
+        # tile by where their box lies in the mosaic, not by position.
+        fields = [empty_emotion_fields() for _ in range(count)]
+        matched = set()
+        for face in emotion_data:
+            i = mosaic_tile(face['box'], cols, count)
+            if i is not None and i not in matched:
+                matched.add(i)
+                fields[i] = emotion_fields(face['emotions'])
+        return fields
+
+    def _face_box(self, landmarks, frame_shape):
+        h, w = frame_shape[:2]
+        xs = [lm.x for lm in landmarks.landmark]
+        ys = [lm.y for lm in landmarks.landmark]
+        x1 = max(0, int(min(xs) * w))
+        y1 = max(0, int(min(ys) * h))
+        x2 = min(w, int(max(xs) * w))
+        y2 = min(h, int(max(ys) * h))
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return (x1, y1, x2 - x1, y2 - y1)
+
+    def _face_tile(self, frame, face_box, margin=0.25):
+        # Cuts a square around the face (with some context, since FER squares
+        # and offsets the rectangle itself) and scales it to a fixed-size tile.
+        # Returns the tile and the face rectangle in tile coordinates.
+        x, y, bw, bh = face_box
+        h, w = frame.shape[:2]
+        side = int(max(bw, bh) * (1 + 2 * margin))
+        sx = x + bw // 2 - side // 2
+        sy = y + bh // 2 - side // 2
+        x1, y1 = max(0, sx), max(0, sy)
+        x2, y2 = min(w, sx + side), min(h, sy + side)
+        scale = FACE_TILE_SIZE / side
+        tile = np.zeros((FACE_TILE_SIZE, FACE_TILE_SIZE, 3), dtype=np.uint8)
+        region = frame[y1:y2, x1:x2]
+        rw = min(FACE_TILE_SIZE, max(1, int(round((x2 - x1) * scale))))
+        rh = min(FACE_TILE_SIZE, max(1, int(round((y2 - y1) * scale))))
+        ox = min(FACE_TILE_SIZE - rw, int((x1 - sx) * scale))
+        oy = min(FACE_TILE_SIZE - rh, int((y1 - sy) * scale))
+        tile[oy:oy + rh, ox:ox + rw] = cv2.resize(region, (rw, rh), interpolation=cv2.INTER_AREA)
+        box = (int((x - sx) * scale), int((y - sy) * scale), int(bw * scale), int(bh * scale))
+        return tile, box
 
     def _check_looking_away(self, landmarks, frame_shape):
         nose_tip = landmarks.landmark[1]
@@ -83,41 +333,11 @@ class VisionProcessor:
         except:
             return 'unknown'
 
-    def _check_needs_help(self, emotions):
-        help_emotions = ['sad', 'angry', 'fear']
-        for emotion in help_emotions:
-            if emotions.get(emotion, 0) > 0.4:
-                return True
-        return False
-
-    def _check_tired(self, emotions):
-        if emotions.get('neutral', 0) > 0.6 and emotions.get('happy', 0) < 0.2:
-            return True
-        return False
-
-    def _calculate_distraction(self, results):
-        distraction = 0.0
-        if results['looking_away']:
-            distraction += 0.4
-        if results['posture'] == 'slouching':
-            distraction += 0.2
-        if not results['face_detected']:
-            distraction += 0.4
-        return min(distraction, 1.0)
-
-    def _generate_suggestion(self, results):
-        if results['is_tired']:
-            return "You look tired. Time for a break?"
-        if results['needs_help']:
-            return "You seem stuck. Need help?"
-        if results['looking_away']:
-            return "Stay focused! Keep your eyes on your work."
-        if results['posture'] == 'slouching':
-            return "Sit up straight for better focus!"
-        if results['distraction_level'] > 0.6:
-            return "You're getting distracted. Refocus on your goal."
-        return None
-
     def cleanup(self):
-        self.face_mesh.close()
-        self.pose.close()
+        for context in self._contexts.values():
+            context.close()
+        self._contexts.clear()
+        if self._overflow is not None:
+            self._overflow.close()
+            self._overflow = None
+            self._overflow_key = None
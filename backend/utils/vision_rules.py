@@ -0,0 +1,63 @@
+# Pure scoring rules shared by the inference workers and the web process.
+# Kept free of cv2/mediapipe/fer imports so the web tier can finish results
+# (e.g. after batched emotion inference) without loading any models.
+
+
+def empty_emotion_fields():
+    return {
+        'emotion': None,
+        'emotion_confidence': 0,
+        'needs_help': False,
+        'is_tired': False
+    }
+
+
+def emotion_fields(emotions):
+    fields = empty_emotion_fields()
+    if not emotions:
+        return fields
+    dominant_emotion = max(emotions, key=emotions.get)
+    fields['emotion'] = dominant_emotion
+    fields['emotion_confidence'] = emotions[dominant_emotion]
+    fields['needs_help'] = check_needs_help(emotions)
+    fields['is_tired'] = check_tired(emotions)
+    return fields
+
+
+def check_needs_help(emotions):
+    help_emotions = ['sad', 'angry', 'fear']
+    for emotion in help_emotions:
+        if emotions.get(emotion, 0) > 0.4:
+            return True
+    return False
+
+
+def check_tired(emotions):
+    if emotions.get('neutral', 0) > 0.6 and emotions.get('happy', 0) < 0.2:
+        return True
+    return False
+
+
+def calculate_distraction(results):
+    distraction = 0.0
+    if results['looking_away']:
+        distraction += 0.4
+    if results['posture'] == 'slouching':
+        distraction += 0.2
+    if not results['face_detected']:
+        distraction += 0.4
+    return min(distraction, 1.0)
+
+
+def generate_suggestion(results):
+    if results['is_tired']:
+        return "You look tired. Time for a break?"
+    if results['needs_help']:
+        return "You seem stuck. Need help?"
+    if results['looking_away']:
+        return "Stay focused! Keep your eyes on your work."
+    if results['posture'] == 'slouching':
+        return "Sit up straight for better focus!"
+    if results['distraction_level'] > 0.6:
+        return "You're getting distracted. Refocus on your goal."
+    return None
@@ -1,4 +1,5 @@
 import {useState, useEffect, useRef} from 'react';
+import {io} from 'socket.io-client';
 import './AIAssistant.css';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
@@ -8,6 +9,8 @@ import 'katex/dist/katex.min.css';
 import './AIAssistant.css';
 import API_URL from './config';
 
+const socket = io(API_URL, {transports: ['websocket']});
+
 function AIAssistant() {
     const [chats, setChats] = useState([]);
     const [currentChatId, setCurrentChatId] = useState(null);
@@ -19,11 +22,62 @@ function AIAssistant() {
 
     const messagesEndRef = useRef(null);
     const fileInputRef = useRef(null);
+    const currentChatIdRef = useRef(null);
 
     useEffect(() => {
         fetchUserChats();
     }, []);
 
+    useEffect(() => {
+        currentChatIdRef.current = currentChatId;
+    }, [currentChatId]);
+
+    useEffect(() => {
+        // Streamed replies: the assistant message grows chunk by chunk and
+        // is replaced by the complete text once the server has saved it.
+        const handleChunk = (data) => {
+            if (data.chat_id !== currentChatIdRef.current) return;
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                if (last && last.streaming) {
+                    return [...prev.slice(0, -1), {...last, content: last.content + data.text}];
+                }
+                return [...prev, {
+                    role: 'assistant',
+                    content: data.text,
+                    timestamp: new Date().toISOString(),
+                    streaming: true
+                }];
+            });
+        };
+        const handleDone = (data) => {
+            if (data.chat_id === currentChatIdRef.current) {
+                setMessages(prev => [...prev.filter(msg => !msg.streaming), {
+                    role: 'assistant',
+                    content: data.response,
+                    timestamp: data.timestamp
+                }]);
+            }
+            setLoading(false);
+            fetchUserChats();
+        };
+        const handleError = (data) => {
+            setMessages(prev => prev.filter(msg => !msg.streaming));
+            setLoading(false);
+            alert('Error: ' + data.error);
+        };
+
+        socket.on('chat_stream_chunk', handleChunk);
+        socket.on('chat_stream_done', handleDone);
+        socket.on('chat_stream_error', handleError);
+
+        return () => {
+            socket.off('chat_stream_chunk', handleChunk);
+            socket.off('chat_stream_done', handleDone);
+            socket.off('chat_stream_error', handleError);
+        };
+    }, []);
+
     useEffect(() => {
         scrollToBottom();
     }, [messages]);
@@ -113,6 +167,15 @@ function AIAssistant() {
         setImagePreview(null);
         setLoading(true);
 
+        if (socket.connected) {
+            socket.emit('chat_stream', {
+                chat_id: currentChatId,
+                message: userMessage,
+                image: imageData
+            });
+            return;
+        }
+
         try {
             const response = await fetch(`${API_URL}/api/chat/message`, {
                 method: 'POST',
@@ -258,7 +321,7 @@ function AIAssistant() {
         </span>
                                 </div>
                             ))}
-                            {loading && (
+                            {loading && !messages[messages.length - 1]?.streaming && (
                                 <div className="message assistant">
                                     <div className="message-content typing">
                                         <span></span><span></span><span></span>
@@ -1,9 +1,12 @@
 import { useState, useEffect } from 'react';
+import { useUser } from '@clerk/clerk-react';
 import './Analytics.css';
 import API_URL from './config';
 
 function Analytics() {
+    const { user } = useUser();
     const [sessions, setSessions] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [selectedPeriod, setSelectedPeriod] = useState('all');
     const [loading, setLoading] = useState(true);
     const [stats, setStats] = useState({
@@ -15,22 +18,41 @@ function Analytics() {
     });
 
     useEffect(() => {
-        fetchSessions();
-    }, []);
-
-    useEffect(() => {
-        if (sessions.length > 0) {
-            calculateStats();
-        }
-    }, [sessions, selectedPeriod]);
+        fetchSessions(null);
+        fetchStats();
+    }, [user?.id, selectedPeriod]);
+
+    const SESSIONS_PAGE_SIZE = 10;
+
+    // First day of the selected period (YYYY-MM-DD, local time), matching
+    // the periods of /api/sessions/summary and the combined reports.
+    const periodStart = () => {
+        const days = {today: 0, week: 7, month: 30}[selectedPeriod];
+        if (days === undefined) return null;
+        const day = new Date();
+        day.setDate(day.getDate() - days);
+        const pad = (n) => String(n).padStart(2, '0');
+        return `${day.getFullYear()}-${pad(day.getMonth() + 1)}-${pad(day.getDate())}`;
+    };
 
-    const fetchSessions = async () => {
+    // Sessions are listed a page at a time, following the keyset cursor.
+    const fetchSessions = async (cursor) => {
         try {
-            const response = await fetch(`${API_URL}/api/sessions/all`);
+            const userId = user?.id || 'user123';
+            const params = new URLSearchParams({
+                user_id: userId,
+                exclude: 'events',
+                limit: String(SESSIONS_PAGE_SIZE)
+            });
+            const start = periodStart();
+            if (start) params.set('start', start);
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`${API_URL}/api/sessions/all?${params}`);
             const data = await response.json();
 
             if (data.success) {
-                setSessions(data.sessions);
+                setSessions(prev => cursor ? [...prev, ...data.sessions] : data.sessions);
+                setNextCursor(data.next_cursor);
             }
             setLoading(false);
         } catch (error) {
@@ -39,59 +61,27 @@ function Analytics() {
         }
     };
 
-    const calculateStats = () => {
-        const filteredSessions = getFilteredSessions();
-
-        if (filteredSessions.length === 0) {
-            setStats({
-                totalSessions: 0,
-                totalStudyTime: 0,
-                averageFocusScore: 0,
-                mostStudiedSubject: '',
-                totalBreaks: 0
-            });
-            return;
-        }
-
-        const totalTime = filteredSessions.reduce((sum, s) => sum + s.duration_actual, 0);
-        const avgScore = filteredSessions.reduce((sum, s) => sum + s.focus_score, 0) / filteredSessions.length;
-
-        const subjects = {};
-        filteredSessions.forEach(s => {
-            subjects[s.subject] = (subjects[s.subject] || 0) + 1;
-        });
-        const mostStudied = Object.keys(subjects).reduce((a, b) => subjects[a] > subjects[b] ? a : b, '');
-
-        const totalBreaks = filteredSessions.reduce((sum, s) => sum + s.breaks.length, 0);
-
-        setStats({
-            totalSessions: filteredSessions.length,
-            totalStudyTime: Math.round(totalTime),
-            averageFocusScore: Math.round(avgScore),
-            mostStudiedSubject: mostStudied,
-            totalBreaks: totalBreaks
-        });
-    };
-
-    const getFilteredSessions = () => {
-        const now = new Date();
-
-        return sessions.filter(session => {
-            const sessionDate = new Date(session.start_time);
+    const fetchStats = async () => {
+        try {
+            const userId = user?.id || 'user123';
+            const response = await fetch(
+                `${API_URL}/api/sessions/summary?user_id=${encodeURIComponent(userId)}&period=${selectedPeriod}`
+            );
+            const data = await response.json();
 
-            switch (selectedPeriod) {
-                case 'today':
-                    return sessionDate.toDateString() === now.toDateString();
-                case 'week':
-                    { const weekAgo = new Date(now.getTime() - 7 * 24 * 60 * 60 * 1000);
-                    return sessionDate >= weekAgo; }
-                case 'month':
-                    { const monthAgo = new Date(now.getTime() - 30 * 24 * 60 * 60 * 1000);
-                    return sessionDate >= monthAgo; }
-                default:
-                    return true;
+            if (data.success) {
+                const summary = data.summary;
+                setStats({
+                    totalSessions: summary.total_sessions,
+                    totalStudyTime: Math.round(summary.total_minutes),
+                    averageFocusScore: Math.round(summary.avg_focus),
+                    mostStudiedSubject: summary.total_sessions > 0 ? summary.most_studied : '',
+                    totalBreaks: summary.total_breaks
+                });
             }
-        });
+        } catch (error) {
+            console.error('Error fetching stats:', error);
+        }
     };
 
     const downloadSingleReport = async (sessionId) => {
@@ -115,7 +105,8 @@ function Analytics() {
 
     const downloadCombinedReport = async (period) => {
         try {
-            const response = await fetch(`${API_URL}/api/report/combined/${period}`);
+            const userId = user?.id || 'user123';
+            const response = await fetch(`${API_URL}/api/report/combined/${period}?user_id=${encodeURIComponent(userId)}`);
             const blob = await response.blob();
 
             const url = window.URL.createObjectURL(blob);
@@ -160,8 +151,6 @@ function Analytics() {
         );
     }
 
-    const filteredSessions = getFilteredSessions();
-
     return (
         <div className="analytics-inner">
             <div className="analytics-top-bar">
@@ -253,16 +242,16 @@ function Analytics() {
             </div>
 
             <div className="sessions-section-compact">
-                <h3>Recent Sessions ({filteredSessions.length})</h3>
+                <h3>Recent Sessions ({stats.totalSessions})</h3>
 
-                {filteredSessions.length === 0 ? (
+                {sessions.length === 0 ? (
                     <div className="empty-state">
                         <p>No sessions found.</p>
                         <p>Start a focus session to see your analytics!</p>
                     </div>
                 ) : (
                     <div className="sessions-list-compact">
-                        {filteredSessions.slice(0, 10).map(session => (
+                        {sessions.map(session => (
                             <div key={session.session_id} className="session-card-compact">
                                 <div className="session-compact-header">
                                     <div>
@@ -292,6 +281,14 @@ function Analytics() {
                                 </button>
                             </div>
                         ))}
+                        {nextCursor && (
+                            <button
+                                className="download-session-btn-compact"
+                                onClick={() => fetchSessions(nextCursor)}
+                            >
+                                Load More
+                            </button>
+                        )}
                     </div>
                 )}
             </div>
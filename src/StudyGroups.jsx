@@ -5,7 +5,7 @@ import { io } from 'socket.io-client';
 import './StudyGroups.css';
 import API_URL from './config';
 
-const socket = io(API_URL);
+const socket = io(API_URL, { transports: ['websocket'] });
 
 function StudyGroups() {
     const { user } = useUser();
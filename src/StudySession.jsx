@@ -4,7 +4,7 @@ import { useUser } from '@clerk/clerk-react';
 import './StudySession.css';
 import API_URL from './config';
 
-const socket = io(API_URL);
+const socket = io(API_URL, { transports: ['websocket'] });
 
 function StudySession({ onBack, onNavigateToNotes }) {
     const { user } = useUser();
@@ -114,13 +114,20 @@ function StudySession({ onBack, onNavigateToNotes }) {
             const ctx = canvas.getContext('2d');
             ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
-            const frameData = canvas.toDataURL('image/jpeg', 0.8);
+            const timestamp = new Date().toISOString();
 
-            socket.emit('video_frame', {
-                session_id: sessionId,
-                frame: frameData,
-                timestamp: new Date().toISOString()
-            });
+            // Send the JPEG as a binary attachment rather than a base64 data URL.
+            canvas.toBlob(async (blob) => {
+                if (!blob) {
+                    return;
+                }
+                const frameData = await blob.arrayBuffer();
+                socket.emit('video_frame', {
+                    session_id: sessionId,
+                    frame: frameData,
+                    timestamp: timestamp
+                });
+            }, 'image/jpeg', 0.8);
         }
     };
 